@@ -1,588 +1,622 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import numpy as np
-import os
-import io
-import base64
-import plotly.graph_objects as go
-
-st.set_page_config(layout="wide")
-
-@st.cache_data
-def load_and_preprocess_data():
-    try:
-        # Caminho do arquivo CSV
-        script_dir = os.path.dirname(os.path.abspath(__file__))  # Corrected: use __file__
-        csv_file_path = os.path.join(script_dir, 'forecast_Fevereiro(Previsoes).csv')
-
-        # Leitura do CSV
-        df = pd.read_csv(csv_file_path, encoding="latin1", sep=";")
-
-        # Renomeação das colunas para remover acentos e espaços indesejados
-        df.rename(columns={
-            "y": "total",
-            "cat_informação": "cat_informacao",
-            "cat_reclamação": "cat_reclamacao",  # renomeia com acento para sem acento
-            "cat_pré-venda": "cat_pre_venda",
-            "cat_solicitação": "cat_solicitacao"
-        }, inplace=True)
-
-        # Conversão de datas
-        df['ds'] = pd.to_datetime(df['ds'], errors='coerce')
-        df['ds_normalized'] = df['ds'].dt.normalize()
-        df['year'] = df['ds'].dt.year
-        df.loc[:, 'year'] = df['year'].replace({np.nan: None})
-        df['month'] = df['ds'].dt.month
-
-        # Seleciona apenas o mês de fevereiro (mês == 2)
-        df = df[df['month'] == 2]
-
-        # Lista de colunas que precisamos converter e somar
-        cols_to_sum = [
-            "cat_cancelamento",
-            "cat_informacao",
-            "cat_reclamacao",
-            "cat_troca",
-            "cat_preventiva",
-            "cat_pre_venda",
-            "cat_solicitacao"
-        ]
-        # Verifica se cada coluna existe, convertendo para numérico ou criando com zeros
-        for col in cols_to_sum:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            else:
-                df[col] = 0
-
-        # Converte a coluna total para numérico
-        df['count'] = df[cols_to_sum].sum(axis=1)
-        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
-
-        # Ajuste: Reescala as categorias para que a soma por linha seja igual ao total
-        df['sum_categories'] = df[cols_to_sum].sum(axis=1)
-        mask = (df['sum_categories'] > 0) & (~np.isclose(df['sum_categories'], df['total']))
-        df.loc[mask, cols_to_sum] = (
-            df.loc[mask, cols_to_sum]
-            .multiply(df.loc[mask, 'total'], axis=0)
-            .div(df.loc[mask, 'sum_categories'], axis=0)
-        )
-        df.drop(columns='sum_categories', inplace=True)
-
-        return df
-    except FileNotFoundError:
-        st.error("Erro: 'forecast_Fevereiro(Previsoes).csv' não encontrado.")
-        st.stop()
-    except Exception as e:
-        st.error(f"Ocorreu um erro ao ler o arquivo CSV: {e}")
-        st.stop()
-
-
-df = load_and_preprocess_data()
-
-# -------------------- Filtros na Sidebar --------------------
-
-st.sidebar.header("Filtros")
-
-# Filtro de Data
-st.sidebar.subheader("Data")
-min_date = df['ds_normalized'].min().date()
-max_date = df['ds_normalized'].max().date()
-selected_dates = st.sidebar.date_input("Selecione o intervalo de dias", [min_date, max_date])
-
-# Filtro de Categoria
-st.sidebar.subheader("Categorias")
-available_categories = [col for col in df.columns if col.startswith('cat_')]
-selected_categories = st.sidebar.multiselect("Selecione as Categorias", available_categories, default=available_categories)
-
-# Filtro de Ano (se houver dados de mais de um ano)
-if df['year'].nunique() > 1:
-    st.sidebar.subheader("Ano")
-    available_years = sorted(df['year'].dropna().unique().tolist())
-    selected_years = st.sidebar.multiselect("Selecione os Anos", available_years, default=available_years)
-else:
-    selected_years = [df['year'].iloc[0]]  # Garante que selected_years esteja sempre definido
-
-# -------------------- Filtragem dos Dados --------------------
-
-filtered_df = df.copy()
-
-# Construir a condição para o filtro
-filter_condition = pd.Series(True, index=filtered_df.index)
-
-# Aplicar o filtro de Data
-if isinstance(selected_dates, list) and len(selected_dates) == 2:
-    start_date, end_date = selected_dates
-    start_date = pd.to_datetime(start_date).date()
-    end_date = pd.to_datetime(end_date).date()
-    filter_condition &= filtered_df['ds_normalized'].dt.date.between(start_date, end_date)
-
-# Aplicar o filtro de Categoria
-if selected_categories:
-    category_filter = filtered_df[selected_categories].any(axis=1)
-    filter_condition &= category_filter
-
-# Aplicar o filtro de Ano
-if 'year' in filtered_df.columns and selected_years:
-    filter_condition &= filtered_df['year'].isin(selected_years)
-
-# Aplicar o filtro combinado
-filtered_df = filtered_df[filter_condition]
-
-# ------ CSS Styling ------
-
-CSS = """
-<style>
-    /* Background da aplicação em um cinza escuro moderno */
-    [data-testid="stAppViewContainer"] {
-        background-color: #2b2b2b;
-    }
-.data-panel {
-    text-align: center;
-    background-color: #2b2b2b; /* Cor de fundo desejada */
-    color: white;
-    padding: 15px;
-    border-radius: 5px;
-    margin-bottom: 10px;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.3), 0 0 10px rgba(0, 0, 0, 0.1) inset; /* Sombra interna e externa */
-
-}
-.data-panel-title {
-    font-size: 0.9em;
-    text-transform: uppercase; /* Converte todos os títulos para maiúsculas */
-}
-.data-panel-value {
-    font-size: 2em;
-    font-weight: bold;
-}
-.data-panel-total {
-    font-size: 0.8em;
-}
-.chart-container {
-    border-bottom: 1px solid #666; /* Adiciona a borda inferior */
-    margin-bottom: 20px; /* Espaçamento abaixo da borda */
-    padding-bottom: 20px; /* Espaçamento entre o gráfico e a borda */
-    box-shadow: 0 1px 2px rgba(0, 0, 0, 0.2); /* Sombra sutil nos gráficos */
-}
-</style>
-"""
-st.markdown(CSS, unsafe_allow_html=True)
-
-# -------------------- Função para exibir os painéis de dados --------------------
-
-def display_data_panels(num_panels, data_dict=None):
-    cols = st.columns(num_panels)
-    with st.container():
-        st.markdown('<div class="panel-row">', unsafe_allow_html=True)
-        for i, col in enumerate(cols):
-            with col:
-                panel_num = i + 1
-                if data_dict and panel_num in data_dict:
-                    title, value, subtext = data_dict[panel_num]
-                    # Formata o valor, removendo decimais e separando por milhar
-                    if isinstance(value, (int, float)):
-                        if value >= 1000:
-                            formatted_value = f"{value:,.0f}".replace(",", ".")
-                        else:
-                            formatted_value = f"{int(value)}"
-                    else:
-                        formatted_value = value
-                    st.markdown(f"""
-                    <div class="data-panel">
-                        <div class="data-panel-title">{title}</div>
-                        <div class="data-panel-value">{formatted_value}</div>
-                        <div class="data-panel-total">{subtext}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(
-                        f'<div class="data-panel"><h3>Painel {panel_num}</h3><h1>{panel_num}</h1></div>',
-                        unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# -------------------- Funções de Gráficos --------------------
-
-def create_total_sum_bar_chart(data, categories):
-    if data.empty:
-        fig = px.bar(title="Sem dados para exibir com os filtros selecionados")
-        fig.update_layout(yaxis_range=[0, 1])  # Define um intervalo mínimo para o eixo Y
-    else:
-        try:
-            for col in categories:
-                data[col] = pd.to_numeric(data[col], errors='coerce')
-            category_sums = data[categories].sum().reset_index()
-            category_sums.rename(columns={'index': 'category'}, inplace=True)
-            category_sums['category'] = category_sums['category'].str.replace('cat_', '')
-            category_sums.columns = ['category', 'total']
-            fig = px.bar(category_sums, x='category', y='total',
-                        title='Total de Casos por Categoria',
-                        color_discrete_sequence=['#CD9A33'],
-                        text_auto=False)  # Desativa o text_auto padrão
-            fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside', textfont=dict(color='white'))  # Formatação: sem decimais, separador de milhar
-            fig.update_layout(
-                height=350,
-                title_x=0.1,
-                margin=dict(b=100),
-                title_font=dict(color='white'),
-                font=dict(size=10),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                xaxis_title=None, yaxis_title=None,
-                xaxis=dict(showgrid=False, zeroline=False),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True),  # Escala dinâmica
-            )
-        except Exception as e:
-            st.error(f"Ocorreu um erro ao gerar o gráfico: {e}")
-            fig = px.bar(title="Erro ao gerar o gráfico")  # Crie um gráfico de erro
-            fig.update_layout(
-                height=350,
-                title_x=0.1,
-                margin=dict(b=100),
-                title_font=dict(color='white'),
-                font=dict(size=10),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                xaxis_title=None, yaxis_title=None,
-                xaxis=dict(showgrid=False, zeroline=False),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            )
-        return fig
-
-def create_daily_sum_bar_charts(data, categories):
-    if data.empty:
-        fig = px.bar(title="Sem dados para exibir com os filtros selecionados")
-        fig.update_layout(yaxis_range=[0, 1])  # Define um intervalo mínimo para o eixo Y
-    else:
-        df_temp = data.copy()
-        today = pd.to_datetime('today').normalize()
-        last_7_days = pd.date_range(start=today, periods=7, freq='D')
-        df_temp = df_temp[df_temp['ds_normalized'].isin(last_7_days)]
-        if df_temp.empty:
-            fig = px.bar(title="Sem dados para exibir nos próximos 7 dias")
-        else:
-            try:
-                for col in categories:
-                    df_temp[col] = pd.to_numeric(df_temp[col], errors='coerce')
-                daily_counts = df_temp.groupby('ds_normalized')[categories].sum().reset_index()
-                daily_counts['daily_sum'] = daily_counts[categories].sum(axis=1)
-                daily_df = daily_counts[['ds_normalized', 'daily_sum']].copy()
-                daily_df.rename(columns={'ds_normalized': 'Dia'}, inplace=True)
-                fig = px.bar(daily_df, x='Dia', y='daily_sum',
-                            title='Contagem Diária de Casos (Próximos 7 Dias)',
-                            color_discrete_sequence=['#CD9A33'],
-                            text_auto=False)  # Desativa o text_auto padrão
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside', textfont=dict(color='white'))  # Formatação: sem decimais, separador de milhar
-                fig.update_layout(
-                    height=350,
-                    title_x=0.1,
-                    margin=dict(b=100),
-                    title_font=dict(color='white'),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                    xaxis_title=None, yaxis_title=None,
-                    xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True), # Escala dinâmica
-                )
-            except Exception as e:
-                st.error(f"Ocorreu um erro ao gerar o gráfico: {e}")
-                fig = px.bar(title="Erro ao gerar o gráfico")  # Crie um gráfico de erro
-                fig.update_layout(
-                    height=350,
-                    title_x=0.1,
-                    margin=dict(b=100),
-                    title_font=dict(color='white'),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                    xaxis_title=None, yaxis_title=None,
-                    xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                )
-            return fig
-
-def create_big_bar_chart(data):
-    if data.empty:
-        fig = px.bar(title="Sem dados para exibir com os filtros selecionados")
-        fig.update_layout(yaxis_range=[0, 1])  # Define um intervalo mínimo para o eixo Y
-    else:
-        df_temp = data.copy()
-        max_date = df_temp['ds_normalized'].max()
-        first_day_month = max_date.replace(day=1)
-        df_temp = df_temp[df_temp['ds_normalized'] >= first_day_month].copy()
-        if df_temp.empty:
-            fig = px.bar(title="Sem dados para exibir no último mês")
-        else:
-            try:
-                pie_categories = ['cat_cancelamento', 'cat_informacao', 'cat_reclamacao',
-                                'cat_troca', 'cat_preventiva', 'cat_pre_venda', 'cat_solicitacao']
-                for col in pie_categories:
-                    df_temp[col] = pd.to_numeric(df_temp[col], errors='coerce')
-                daily_counts = df_temp.groupby('ds_normalized')[pie_categories].sum().reset_index()
-                daily_counts['monthly_sum'] = daily_counts[pie_categories].sum(axis=1)
-                daily_df = daily_counts[['ds_normalized', 'monthly_sum']].copy()
-                daily_df.rename(columns={'ds_normalized': 'Dia'}, inplace=True)
-                fig = px.bar(daily_df, x='Dia', y='monthly_sum',
-                            title='Contagem Diária de Casos (1 Mês)',
-                            color_discrete_sequence=['#CD9A33'],
-                            text_auto=False)  # Desativa o text_auto padrão
-                fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside', textfont=dict(color='white'))  # Formatação: sem decimais, separador de milhar
-                fig.update_layout(
-                    height=350,
-                    title_x=0.1,
-                    margin=dict(b=100),
-                    title_font=dict(color='white'),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                    xaxis_title=None, yaxis_title=None,
-                    xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True) # Escala dinâmica
-                )
-            except Exception as e:
-                st.error(f"Ocorreu um erro ao gerar o gráfico: {e}")
-                fig = px.bar(title="Erro ao gerar o gráfico")  # Crie um gráfico de erro
-                fig.update_layout(
-                    height=350,
-                    title_x=0.1,
-                    margin=dict(b=100),
-                    title_font=dict(color='white'),
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                    xaxis_title=None, yaxis_title=None,
-                    xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                )
-            return fig
-
-# Nova função: gráfico de linha suavizado para os últimos 30 dias
-
-def create_30_day_category_smoothed_line_chart(data):
-    df_temp = data.copy()
-
-    # Renomear a coluna 'ds_normalized' para 'Data' para melhor exibição
-    if 'ds_normalized' in df_temp.columns:
-        df_temp = df_temp.rename(columns={'ds_normalized': 'Data'})
-    else:
-        fig = px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
-        return fig
-
-    max_date = df_temp['Data'].max()
-    if pd.isna(max_date):
-        fig = px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
-        return fig
-
-    last_30_days = pd.date_range(end=max_date, periods=30, freq='D')
-    df_temp = df_temp[df_temp['Data'].isin(last_30_days)]
-
-    if df_temp.empty:
-        fig = px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
-    else:
-        try:
-            category_cols = [
-                "cat_cancelamento",
-                "cat_informacao",
-                "cat_reclamacao",
-                "cat_troca",
-                "cat_preventiva",
-                "cat_pre_venda",
-                "cat_solicitacao"
-            ]
-            for col in category_cols:
-                df_temp[col] = pd.to_numeric(df_temp[col], errors='coerce').fillna(0)
-
-            daily_counts = df_temp.groupby('Data')[category_cols].sum().reset_index()
-            daily_counts = daily_counts.melt(id_vars='Data', var_name='category', value_name='count')
-            daily_counts['category'] = daily_counts['category'].str.replace('cat_', '')
-
-            fig = px.line(
-                daily_counts,
-                x='Data',
-                y='count',
-                color='category',
-                title='Contagem Diária de Casos por Categoria (Últimos 30 Dias)',
-                color_discrete_sequence=px.colors.qualitative.Pastel,
-                hover_data={"Data": "|%b %d", "count": ":,.0f", "category": True}  # Formata o texto ao passar o mouse
-            )
-
-            fig.update_traces(line_shape='spline', mode='lines+markers')
-            fig.update_layout(
-                height=350,
-                title_x=0.1,
-                margin=dict(b=100),
-                title_font=dict(color='white'),
-                font=dict(size=10),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                xaxis_title=None, yaxis_title=None,
-                xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                legend_title=None,
-            )
-            return fig
-        except Exception as e:
-            st.error(f"Ocorreu um erro ao gerar o gráfico: {e}")
-            fig = px.line(title="Erro ao gerar o gráfico")  # Crie um gráfico de erro
-            fig.update_layout(
-                height=350,
-                title_x=0.1,
-                margin=dict(b=100),
-                title_font=dict(color='white'),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                margin_t=50, margin_b=50, margin_l=0, margin_r=0,
-                xaxis_title=None, yaxis_title=None,
-                xaxis=dict(showgrid=False, zeroline=False, tickformat='%b %d', showticklabels=True),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            )
-            return fig
-
-# -------------------- Função para exibir os painéis de dados --------------------
-
-def display_data_panels(num_panels, data_dict=None):
-    cols = st.columns(num_panels)
-    with st.container():
-        st.markdown('<div class="panel-row">', unsafe_allow_html=True)
-        for i, col in enumerate(cols):
-            with col:
-                panel_num = i + 1
-                if data_dict and panel_num in data_dict:
-                    title, value, subtext = data_dict[panel_num]
-                    # Formata o valor, removendo decimais e separando por milhar
-                    if isinstance(value, (int, float)):
-                        if value >= 1000:
-                            formatted_value = f"{value:,.0f}".replace(",", ".")
-                        else:
-                            formatted_value = f"{int(value)}"
-                    else:
-                        formatted_value = value
-                    st.markdown(f"""
-                    <div class="data-panel">
-                        <div class="data-panel-title">{title}</div>
-                        <div class="data-panel-value">{formatted_value}</div>
-                        <div class="data-panel-total">{subtext}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(
-                        f'<div class="data-panel"><h3>Painel {panel_num}</h3><h1>{panel_num}</h1></div>',
-                        unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# -------------------- Cálculo das Métricas e Painéis --------------------
-
-categories = [
-    'cat_cancelamento', 'cat_informacao', 'cat_reclamacao',
-    'cat_troca', 'cat_preventiva', 'cat_pre_venda', 'cat_solicitacao'
-]
-first_7_categories = categories[:7]
-
-if not filtered_df.empty:
-    category_totals = {cat: filtered_df[cat].sum() if cat in filtered_df.columns else 0 for cat in first_7_categories}
-    total_cases = filtered_df['total'].sum()
-
-   # total_days = filtered_df['Data'].nunique() if 'Data' in filtered_df.columns else 0 #linha corrigida
-
-    total_days = filtered_df['ds_normalized'].nunique() if 'ds_normalized' in filtered_df.columns else 0 #Linha original
-
-    average_cases_per_day = total_cases / total_days if total_days != 0 else 0
-    panel_data = {
-        1: (first_7_categories[0].replace("cat_", ""), category_totals.get(first_7_categories[0], 0), "Total"),
-        2: (first_7_categories[1].replace("cat_", ""), category_totals.get(first_7_categories[1], 0), "Total"),
-        3: (first_7_categories[2].replace("cat_", ""), category_totals.get(first_7_categories[2], 0), "Total"),
-        4: (first_7_categories[3].replace("cat_", ""), category_totals.get(first_7_categories[3], 0), "Total"),
-        5: (first_7_categories[4].replace("cat_", ""), category_totals.get(first_7_categories[4], 0), "Total"),
-        6: (first_7_categories[5].replace("cat_", ""), category_totals.get(first_7_categories[5], 0), "Total"),
-        7: (first_7_categories[6].replace("cat_", ""), category_totals.get(first_7_categories[6], 0), "Total"),
-        8: ("Total de Casos", total_cases, ""),
-        9: ("Dias", total_days, ""),
-        10: ("Média de casos", average_cases_per_day, "")
-    }
-else:
-    # Define valores padrão para os painéis de dados
-    panel_data = {
-        1: ("N/A", 0, "Sem Dados"),
-        2: ("N/A", 0, "Sem Dados"),
-        3: ("N/A", 0, "Sem Dados"),
-        4: ("N/A", 0, "Sem Dados"),
-        5: ("N/A", 0, "Sem Dados"),
-        6: ("N/A", 0, "Sem Dados"),
-        7: ("N/A", 0, "Sem Dados"),
-        8: ("Total de Casos", 0, ""),
-        9: ("Dias", 0, ""),
-        10: ("Média de casos", 0, "")
-    }
-
-# -------------------- Exibição dos Painéis --------------------
-
-upper_panels = {i: panel_data[i] for i in range(1, 8)}
-display_data_panels(7, upper_panels)
-
-lower_panels = {i+1: v for i, v in enumerate(list(panel_data.values())[7:10])}
-display_data_panels(3, lower_panels)
-
-# -------------------- Exibição dos Gráficos --------------------
-
-cols4 = st.columns(2)
-
-def display_chart(col, chart_func, data, categories, title="Sem dados para exibir"):
-    with col:
-        st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
-        st.markdown("<div>", unsafe_allow_html=True)
-        st.plotly_chart(chart_func(data, categories), use_container_width=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-
-display_chart(cols4[0], create_total_sum_bar_chart, filtered_df, first_7_categories)
-display_chart(cols4[1], create_daily_sum_bar_charts, filtered_df, first_7_categories)
-
-st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
-st.markdown("<div>", unsafe_allow_html=True)
-st.plotly_chart(create_big_bar_chart(filtered_df), use_container_width=True)
-st.markdown("</div>", unsafe_allow_html=True)
-st.markdown("</div>", unsafe_allow_html=True)
-
-# Gráfico de linha suavizado para os últimos 30 dias
-
-st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
-st.markdown("<div>", unsafe_allow_html=True)
-st.plotly_chart(create_30_day_category_smoothed_line_chart(filtered_df), use_container_width=True)
-st.markdown("</div>", unsafe_allow_html=True)
-st.markdown("</div>", unsafe_allow_html=True)
-
-# -------------------- Exportação de Dados --------------------
-
-st.markdown("### Exportar Dados")
-download_format = st.radio("Selecione o formato:", ["csv", "xlsx"], horizontal=True)
-if st.button("Gerar Link de Download"):
-    if not filtered_df.empty:
-        def generate_download_link(data, file_format):
-            if file_format == 'csv':
-                output = io.StringIO()
-                data.to_csv(output, index=False, encoding='utf-8')
-                csv_data = output.getvalue()
-                b64 = base64.b64encode(csv_data.encode()).decode()
-                return f'<a href="data:file/csv;base64,{b64}" download="dashboard_data.csv">Baixar CSV</a>'
-            elif file_format == 'xlsx':
-                output = io.BytesIO()
-                data_export = data.copy()
-                data_export = data_export.drop(columns=['year', 'month', 'ds_normalized'])
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    data_export.to_excel(writer, index=False, sheet_name='Dashboard Data')
-                    for column in data_export.columns:
-                        column_width = max(data_export[column].astype(str).map(len).max(), len(column))
-                        col_idx = data_export.columns.get_loc(column)
-                        writer.sheets['Dashboard Data'].set_column(col_idx, col_idx, column_width + 2)
-                xlsx_data = output.getvalue()
-                b64 = base64.b64encode(xlsx_data).decode()
-                return f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="dashboard_data.xlsx">Baixar XLSX</a>'
-            else:
-                return ""
-        download_link = generate_download_link(filtered_df, download_format)
-        st.markdown(download_link, unsafe_allow_html=True)
-    else:
-        st.warning("Nenhum dado para exportar.")
\ No newline at end of file
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from aggregations import ROLLING_WINDOWS, YEAR_ALIGNMENTS
+from charts import (
+    create_30_day_category_smoothed_line_chart,
+    create_big_bar_chart,
+    create_channel_heatmap,
+    create_daily_sum_bar_charts,
+    create_forecast_vs_actual_chart,
+    create_month_comparison_chart,
+    create_total_sum_bar_chart,
+    create_year_over_year_chart,
+    figure_cache_key,
+    format_channel,
+    memoized_figure,
+)
+from accuracy import discover_actuals, files_signature, load_accuracy_index
+from export import EXPORT_FORMATS, available_formats, check_row_limit, generate_export_file
+from filters import apply_filters, project_categories
+from forecast_api import panel_metrics
+from forecast_catalog import FORECAST_PATTERN, discover_forecasts
+from forecast_db import ForecastDatabase, ForecastTable, default_database_path, default_sql_backend
+from forecast_store import DEFAULT_REFRESH_SECONDS, ForecastStore, PrecomputeWorker
+from profiling import RunProfiler, profiling_enabled
+
+st.set_page_config(layout="wide")
+
+# Modo de perfil (?profile=1 ou DASHBOARD_PROFILE=1): tempo e memória de cada etapa
+profiler = RunProfiler(profiling_enabled(st.query_params))
+
+# Diretório com os arquivos de previsão mensais (forecast_<Mês>...csv)
+script_dir = os.path.dirname(os.path.abspath(__file__))  # Corrected: use __file__
+forecast_dir = os.environ.get("FORECAST_DATA_DIR", script_dir)
+
+# Quantos meses processados ficam em memória ao mesmo tempo (LRU do ForecastStore)
+MAX_LOADED_FORECASTS = int(os.environ.get("FORECAST_MAX_LOADED", "3"))
+
+# Worker de pré-cálculo: mantém os meses atualizados em segundo plano, então as
+# sessões só leem a versão publicada (FORECAST_PRECOMPUTE=0 volta a verificar a cada execução)
+PRECOMPUTE_ENABLED = os.environ.get("FORECAST_PRECOMPUTE", "1").lower() not in ("0", "false", "no", "off")
+REFRESH_SECONDS = float(os.environ.get("FORECAST_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS))
+
+# Backend de armazenamento: "pandas" (padrão, linhas em memória) ou um banco SQL local
+# ("duckdb" ou "sqlite"; "sql" escolhe o DuckDB se instalado) para históricos grandes
+FORECAST_BACKEND = os.environ.get("FORECAST_BACKEND", "pandas").lower()
+FORECAST_DB_PATH = os.environ.get("FORECAST_DB_PATH")
+
+
+@st.cache_resource
+def get_forecast_store(directory):
+    # Um store por processo, compartilhado entre sessões: frames e agregados por mês
+    # e a assinatura (hash/tamanho/mtime) da versão do arquivo já processada
+    database = None
+    if FORECAST_BACKEND != "pandas":
+        backend = default_sql_backend() if FORECAST_BACKEND == "sql" else FORECAST_BACKEND
+        database = ForecastDatabase(FORECAST_DB_PATH or default_database_path(directory, backend), backend)
+    store = ForecastStore(MAX_LOADED_FORECASTS, database)
+    if PRECOMPUTE_ENABLED:
+        PrecomputeWorker(store, directory, REFRESH_SECONDS).start()
+    return store
+
+
+def load_and_preprocess_data(forecast):
+    store = get_forecast_store(forecast_dir)
+    try:
+        return store.get(forecast) if PRECOMPUTE_ENABLED else store.refresh(forecast)
+    except FileNotFoundError:
+        st.error(f"Erro: '{os.path.basename(forecast.path)}' não encontrado.")
+        st.stop()
+    except Exception as e:
+        st.error(f"Ocorreu um erro ao ler o arquivo CSV: {e}")
+        st.stop()
+
+
+# -------------------- Filtros na Sidebar --------------------
+
+st.sidebar.header("Filtros")
+
+# Seleção do mês de previsão (arquivos são lidos apenas quando selecionados)
+forecast_files = discover_forecasts(forecast_dir)
+if not forecast_files:
+    st.error(f"Erro: nenhum arquivo de previsão ({FORECAST_PATTERN}) encontrado em '{forecast_dir}'.")
+    st.stop()
+
+st.sidebar.subheader("Previsão")
+selected_forecast = st.sidebar.selectbox(
+    "Selecione o mês", forecast_files, index=len(forecast_files) - 1,
+    format_func=lambda forecast: forecast.label)
+other_forecasts = [forecast for forecast in forecast_files if forecast != selected_forecast]
+compared_forecasts = st.sidebar.multiselect(
+    "Comparar com", other_forecasts, format_func=lambda forecast: forecast.label
+) if other_forecasts else []
+
+forecast_state = profiler.call('load_and_preprocess_data', load_and_preprocess_data, selected_forecast)
+data_version = forecast_state['source']['sha256']
+daily_df = forecast_state['daily']
+if daily_df.empty:
+    # Arquivo recém-criado (só cabeçalho) ou sem linhas do mês do nome: sem datas para os filtros
+    st.warning(f"'{os.path.basename(selected_forecast.path)}' não tem dados de {selected_forecast.label}.")
+    st.stop()
+channel_matrix = forecast_state['channels']
+rolling_rollup = forecast_state['rolling']
+
+# Filtro de Data
+st.sidebar.subheader("Data")
+min_date = daily_df['ds_normalized'].min().date()
+max_date = daily_df['ds_normalized'].max().date()
+selected_dates = st.sidebar.date_input("Selecione o intervalo de dias", [min_date, max_date])
+
+# Filtro de Categoria
+st.sidebar.subheader("Categorias")
+available_categories = [col for col in daily_df.columns if col.startswith('cat_')]
+selected_categories = st.sidebar.multiselect("Selecione as Categorias", available_categories, default=available_categories)
+
+# Filtro de Ano (se houver dados de mais de um ano)
+if daily_df['year'].nunique() > 1:
+    st.sidebar.subheader("Ano")
+    available_years = sorted(daily_df['year'].dropna().unique().tolist())
+    selected_years = st.sidebar.multiselect("Selecione os Anos", available_years, default=available_years)
+    # Modo de comparação: o mesmo mês em cada ano selecionado, lado a lado em vez de somado
+    year_comparison = st.sidebar.checkbox("Comparar anos")
+else:
+    selected_years = [daily_df['year'].iloc[0]]  # Garante que selected_years esteja sempre definido
+    year_comparison = False
+
+# Filtro de Canal
+st.sidebar.subheader("Canais")
+available_channels = channel_matrix.channels
+selected_channels = st.sidebar.multiselect(
+    "Selecione os Canais", available_channels, default=available_channels,
+    format_func=lambda channel: format_channel(channel))
+
+# -------------------- Filtragem dos Dados --------------------
+
+with profiler.stage('filters'):
+    # Os gráficos e painéis usam o rollup diário; as linhas brutas só são filtradas na exportação.
+    # Data e ano são fatias por busca binária; as categorias são uma projeção de colunas.
+    filtered_daily = apply_filters(daily_df, selected_dates, selected_years)
+    active_categories = project_categories(available_categories, selected_categories)
+
+    # Canais: mesmos dias do rollup filtrado, apenas as colunas dos canais selecionados
+    channel_rows = channel_matrix.rows_for(filtered_daily['ds_normalized'])
+    active_channels = [channel for channel in available_channels if channel in selected_channels]
+
+# Estado dos filtros que entra na chave do cache de figuras (junto com a versão dos dados)
+filter_state = (tuple(selected_dates), tuple(active_categories), tuple(selected_years))
+
+
+def chart_figure(chart_name, build, *params):
+    with profiler.stage(chart_name):
+        return memoized_figure(figure_cache_key(chart_name, data_version, *filter_state, *params), build)
+
+
+# Os gráficos são independentes: cada um é construído em um pool de threads, e a própria
+# thread preenche o espaço reservado assim que a figura fica pronta, enquanto o script
+# segue com as seções seguintes. wait_for_charts só espera os que faltam no fim da execução.
+CHART_WORKERS = int(os.environ.get("DASHBOARD_CHART_WORKERS", "4"))
+
+
+@st.cache_resource
+def get_chart_executor():
+    return ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="charts")
+
+
+chart_jobs = []
+script_ctx = get_script_run_ctx()
+
+
+def _render_in_script_context(placeholder, chart_name, build, *params):
+    # Com o contexto da execução, st.error e o preenchimento do espaço reservado funcionam
+    # fora da thread do script. key=chart_name: gráficos diferentes podem gerar figuras
+    # idênticas (ex.: o gráfico vazio quando o filtro não tem dias), o que geraria IDs duplicados
+    add_script_run_ctx(threading.current_thread(), script_ctx)
+    figure = chart_figure(chart_name, build, *params)
+    placeholder.plotly_chart(figure, use_container_width=True, key=chart_name)
+
+
+def submit_chart(chart_name, build, *params):
+    placeholder = st.empty()
+    chart_jobs.append(get_chart_executor().submit(_render_in_script_context, placeholder, chart_name, build, *params))
+
+
+def wait_for_charts():
+    # A execução só termina com todos os gráficos desenhados; result() repassa os erros
+    for future in chart_jobs:
+        future.result()
+    chart_jobs.clear()
+
+
+# Seções com widgets próprios (média móvel, alinhamento dos anos, formato da exportação)
+# são fragmentos: interagir com elas reexecuta só a seção, com as mesmas entradas da
+# última execução completa. Os filtros da barra lateral continuam reexecutando a página
+# inteira, e os gráficos que não mudaram saem do cache de figuras.
+# Dentro de um fragmento o gráfico é construído na própria execução, sem o pool.
+
+def fragment_chart(chart_name, build, *params):
+    st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+    st.markdown("<div>", unsafe_allow_html=True)
+    st.plotly_chart(chart_figure(chart_name, build, *params), use_container_width=True, key=chart_name)
+    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ------ CSS Styling ------
+
+CSS = """
+<style>
+    /* Background da aplicação em um cinza escuro moderno */
+    [data-testid="stAppViewContainer"] {
+        background-color: #2b2b2b;
+    }
+.data-panel {
+    text-align: center;
+    background-color: #2b2b2b; /* Cor de fundo desejada */
+    color: white;
+    padding: 15px;
+    border-radius: 5px;
+    margin-bottom: 10px;
+    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.3), 0 0 10px rgba(0, 0, 0, 0.1) inset; /* Sombra interna e externa */
+
+}
+.data-panel-title {
+    font-size: 0.9em;
+    text-transform: uppercase; /* Converte todos os títulos para maiúsculas */
+}
+.data-panel-value {
+    font-size: 2em;
+    font-weight: bold;
+}
+.data-panel-total {
+    font-size: 0.8em;
+}
+.chart-container {
+    border-bottom: 1px solid #666; /* Adiciona a borda inferior */
+    margin-bottom: 20px; /* Espaçamento abaixo da borda */
+    padding-bottom: 20px; /* Espaçamento entre o gráfico e a borda */
+    box-shadow: 0 1px 2px rgba(0, 0, 0, 0.2); /* Sombra sutil nos gráficos */
+}
+</style>
+"""
+st.markdown(CSS, unsafe_allow_html=True)
+
+# -------------------- Função para exibir os painéis de dados --------------------
+
+def display_data_panels(num_panels, data_dict=None):
+    cols = st.columns(num_panels)
+    with st.container():
+        st.markdown('<div class="panel-row">', unsafe_allow_html=True)
+        for i, col in enumerate(cols):
+            with col:
+                panel_num = i + 1
+                if data_dict and panel_num in data_dict:
+                    title, value, subtext = data_dict[panel_num]
+                    # Formata o valor, removendo decimais e separando por milhar
+                    if isinstance(value, (int, float, np.number)):
+                        if value >= 1000:
+                            formatted_value = f"{value:,.0f}".replace(",", ".")
+                        else:
+                            formatted_value = f"{int(value)}"
+                    else:
+                        formatted_value = value
+                    st.markdown(f"""
+                    <div class="data-panel">
+                        <div class="data-panel-title">{title}</div>
+                        <div class="data-panel-value">{formatted_value}</div>
+                        <div class="data-panel-total">{subtext}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown(
+                        f'<div class="data-panel"><h3>Painel {panel_num}</h3><h1>{panel_num}</h1></div>',
+                        unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# -------------------- Função para exibir os painéis de dados --------------------
+
+def display_data_panels(num_panels, data_dict=None):
+    cols = st.columns(num_panels)
+    with st.container():
+        st.markdown('<div class="panel-row">', unsafe_allow_html=True)
+        for i, col in enumerate(cols):
+            with col:
+                panel_num = i + 1
+                if data_dict and panel_num in data_dict:
+                    title, value, subtext = data_dict[panel_num]
+                    # Formata o valor, removendo decimais e separando por milhar
+                    if isinstance(value, (int, float, np.number)):
+                        if value >= 1000:
+                            formatted_value = f"{value:,.0f}".replace(",", ".")
+                        else:
+                            formatted_value = f"{int(value)}"
+                    else:
+                        formatted_value = value
+                    st.markdown(f"""
+                    <div class="data-panel">
+                        <div class="data-panel-title">{title}</div>
+                        <div class="data-panel-value">{formatted_value}</div>
+                        <div class="data-panel-total">{subtext}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown(
+                        f'<div class="data-panel"><h3>Painel {panel_num}</h3><h1>{panel_num}</h1></div>',
+                        unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# -------------------- Cálculo das Métricas e Painéis --------------------
+
+categories = [
+    'cat_cancelamento', 'cat_informacao', 'cat_reclamacao',
+    'cat_troca', 'cat_preventiva', 'cat_pre_venda', 'cat_solicitacao'
+]
+first_7_categories = categories[:7]
+
+if not filtered_daily.empty:
+    # Mesmas métricas expostas sem interface pelo forecast_api (o rollup tem uma linha por dia)
+    metrics = panel_metrics(filtered_daily, active_categories)
+    category_totals = metrics['category_totals']
+    total_cases = metrics['total_cases']
+    total_days = metrics['days']
+    average_cases_per_day = metrics['average_cases_per_day']
+    panel_data = {
+        1: (first_7_categories[0].replace("cat_", ""), category_totals.get(first_7_categories[0], 0), "Total"),
+        2: (first_7_categories[1].replace("cat_", ""), category_totals.get(first_7_categories[1], 0), "Total"),
+        3: (first_7_categories[2].replace("cat_", ""), category_totals.get(first_7_categories[2], 0), "Total"),
+        4: (first_7_categories[3].replace("cat_", ""), category_totals.get(first_7_categories[3], 0), "Total"),
+        5: (first_7_categories[4].replace("cat_", ""), category_totals.get(first_7_categories[4], 0), "Total"),
+        6: (first_7_categories[5].replace("cat_", ""), category_totals.get(first_7_categories[5], 0), "Total"),
+        7: (first_7_categories[6].replace("cat_", ""), category_totals.get(first_7_categories[6], 0), "Total"),
+        8: ("Total de Casos", total_cases, ""),
+        9: ("Dias", total_days, ""),
+        10: ("Média de casos", average_cases_per_day, "")
+    }
+else:
+    # Define valores padrão para os painéis de dados
+    panel_data = {
+        1: ("N/A", 0, "Sem Dados"),
+        2: ("N/A", 0, "Sem Dados"),
+        3: ("N/A", 0, "Sem Dados"),
+        4: ("N/A", 0, "Sem Dados"),
+        5: ("N/A", 0, "Sem Dados"),
+        6: ("N/A", 0, "Sem Dados"),
+        7: ("N/A", 0, "Sem Dados"),
+        8: ("Total de Casos", 0, ""),
+        9: ("Dias", 0, ""),
+        10: ("Média de casos", 0, "")
+    }
+
+# -------------------- Exibição dos Painéis --------------------
+
+upper_panels = {i: panel_data[i] for i in range(1, 8)}
+profiler.call('display_data_panels', display_data_panels, 7, upper_panels)
+
+lower_panels = {i+1: v for i, v in enumerate(list(panel_data.values())[7:10])}
+profiler.call('display_data_panels', display_data_panels, 3, lower_panels)
+
+# -------------------- Exibição dos Gráficos --------------------
+
+cols4 = st.columns(2)
+
+def display_chart(col, chart_name, build, *params):
+    with col:
+        st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+        st.markdown("<div>", unsafe_allow_html=True)
+        submit_chart(chart_name, build, *params)
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+display_chart(cols4[0],
+    'create_total_sum_bar_chart', lambda: create_total_sum_bar_chart(filtered_daily, active_categories))
+# O gráfico dos próximos 7 dias depende também da data de hoje
+display_chart(cols4[1],
+    'create_daily_sum_bar_charts', lambda: create_daily_sum_bar_charts(filtered_daily, active_categories),
+    pd.Timestamp.today().date())
+
+st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+st.markdown("<div>", unsafe_allow_html=True)
+submit_chart('create_big_bar_chart', lambda: create_big_bar_chart(filtered_daily, active_categories))
+st.markdown("</div>", unsafe_allow_html=True)
+st.markdown("</div>", unsafe_allow_html=True)
+
+# Gráfico de linha para os últimos 30 dias, com média móvel configurável.
+# As médias saem das somas acumuladas do rollup: trocar a janela não refaz agregações.
+# Depende de: dias filtrados, categorias e janela (fragmento: a janela só refaz este gráfico).
+
+@st.fragment
+def rolling_chart_section(days, categories):
+    rolling_window = st.select_slider(
+        "Média móvel", options=ROLLING_WINDOWS, value=7,
+        format_func=lambda window: "Diário" if window == 1 else f"{window} dias")
+    fragment_chart(
+        'create_30_day_category_smoothed_line_chart',
+        lambda: create_30_day_category_smoothed_line_chart(
+            rolling_rollup.rolling_frame(days, rolling_window, categories), categories, rolling_window),
+        rolling_window)
+
+
+rolling_chart_section(filtered_daily['ds_normalized'], active_categories)
+
+# Variação semanal: 7 dias até o último dia do período contra os 7 dias anteriores
+if not filtered_daily.empty:
+    current_week, previous_week = rolling_rollup.week_over_week(
+        filtered_daily['ds_normalized'].iloc[-1], active_categories)
+    current_week, previous_week = current_week.sum(), previous_week.sum()
+    week_change = (f"{current_week / previous_week - 1:+.1%}".replace(".", ",")
+                   if previous_week > 0 else "N/A")
+    profiler.call('display_data_panels', display_data_panels, 3, {
+        1: ("Últimos 7 dias", current_week, filtered_daily['ds_normalized'].iloc[-1].strftime("até %d/%m")),
+        2: ("7 dias anteriores", previous_week, ""),
+        3: ("Variação semanal", week_change, ""),
+    })
+
+# Comparação entre anos: fatias do cubo ano x dia x categoria pré-calculado,
+# então o custo não cresce com o número de anos.
+# Depende de: cubo, anos e categorias selecionados e alinhamento (fragmento).
+
+@st.fragment
+def year_comparison_section(year_cube, compared_years, categories):
+    year_alignment = st.radio(
+        "Alinhar por", YEAR_ALIGNMENTS, horizontal=True,
+        format_func=lambda align: "Dia da semana" if align == 'weekday' else "Dia do mês")
+    reference_year, previous_year = compared_years[-1], compared_years[-2]
+    year_totals, common_days = year_cube.common_totals(
+        [previous_year, reference_year], categories, year_alignment)
+    year_panels = {}
+    for i, cat in enumerate(categories[:7]):
+        previous_total, reference_total = year_totals[0, i], year_totals[1, i]
+        if previous_total > 0:
+            change = f"{reference_total / previous_total - 1:+.1%} vs {previous_year}".replace(".", ",")
+        else:
+            change = f"Sem dados em {previous_year}"
+        year_panels[i + 1] = (cat.replace("cat_", ""), reference_total, change)
+    profiler.call('display_data_panels', display_data_panels, len(year_panels), year_panels)
+    st.caption(f"{reference_year} contra {previous_year}, nos {common_days} dias presentes nos dois anos.")
+
+    fragment_chart(
+        'create_year_over_year_chart',
+        lambda: create_year_over_year_chart(
+            compared_years, year_cube.daily_totals(compared_years, categories, year_alignment),
+            year_alignment),
+        year_alignment)
+
+
+if year_comparison:
+    year_cube = forecast_state['years']
+    compared_years = [year for year in year_cube.years if year in selected_years]
+    st.markdown("### Comparação entre anos")
+    if len(compared_years) > 1:
+        year_comparison_section(year_cube, compared_years, active_categories)
+    else:
+        st.info("Selecione ao menos dois anos com dados para comparar.")
+
+# Comparação com outros meses (cada mês é carregado sob demanda)
+
+if compared_forecasts:
+    compared_states = [(forecast, load_and_preprocess_data(forecast)) for forecast in compared_forecasts]
+    comparison_rollups = [(selected_forecast.label, filtered_daily)] + [
+        (forecast.label, state['daily']) for forecast, state in compared_states
+    ]
+    comparison_versions = tuple((forecast.path, state['source']['sha256']) for forecast, state in compared_states)
+    st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+    st.markdown("<div>", unsafe_allow_html=True)
+    submit_chart(
+        'create_month_comparison_chart', lambda: create_month_comparison_chart(comparison_rollups, active_categories),
+        comparison_versions)
+    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# -------------------- Canais de Venda --------------------
+
+st.markdown("### Canais")
+channel_totals = channel_matrix.totals(channel_rows, active_channels)
+if len(active_channels) and channel_totals.sum() > 0:
+    # Painéis com os 5 canais de maior volume no período
+    all_channels_total = channel_totals.sum()
+    top_positions = np.argsort(channel_totals)[::-1][:5]
+    channel_panels = {
+        i + 1: (format_channel(active_channels[pos]), channel_totals[pos],
+                f"{channel_totals[pos] / all_channels_total:.1%} dos canais".replace(".", ","))
+        for i, pos in enumerate(top_positions)
+    }
+    profiler.call('display_data_panels', display_data_panels, len(channel_panels), channel_panels)
+else:
+    st.info("Sem dados de canais para os filtros selecionados.")
+
+st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+st.markdown("<div>", unsafe_allow_html=True)
+submit_chart(
+    'create_channel_heatmap',
+    lambda: create_channel_heatmap(channel_matrix.days[channel_rows], active_channels,
+                                   channel_matrix.submatrix(channel_rows, active_channels)),
+    tuple(active_channels))
+st.markdown("</div>", unsafe_allow_html=True)
+st.markdown("</div>", unsafe_allow_html=True)
+
+# -------------------- Previsão x Realizado --------------------
+
+# Com arquivos actuals_*.csv no diretório, compara o previsto de todos os meses com o
+# realizado. O índice (junção por data + somas acumuladas de erro) é montado uma vez
+# por versão dos arquivos; os filtros apenas consultam intervalos dele.
+
+
+@st.cache_resource(max_entries=2)
+def get_accuracy_index(directory, signature):
+    # Rollups e matrizes de canais do ForecastStore (ou do banco SQL), sem reler os CSVs
+    return load_accuracy_index(directory, get_forecast_store(directory).aggregates)
+
+
+def format_percent(value, signed=False):
+    if pd.isna(value):
+        return "N/A"
+    return (f"{value:+.1%}" if signed else f"{value:.1%}").replace(".", ",")
+
+
+actuals_files = discover_actuals(forecast_dir)
+if actuals_files:
+    st.markdown("### Previsão x Realizado")
+    accuracy_signature = files_signature([forecast.path for forecast in forecast_files] + actuals_files)
+    accuracy_index = profiler.call('get_accuracy_index', get_accuracy_index, forecast_dir, accuracy_signature)
+    # Mesmo período do filtro de datas (o histórico inteiro durante a seleção do intervalo)
+    accuracy_start, accuracy_end = selected_dates if len(selected_dates) == 2 else (None, None)
+    accuracy_columns = ['total'] + active_categories + active_channels
+    accuracy = accuracy_index.summary(accuracy_columns, accuracy_start, accuracy_end)
+    if len(accuracy) and accuracy['days'].iloc[0] > 0:
+        overall = accuracy.iloc[0]
+        profiler.call('display_data_panels', display_data_panels, 3, {
+            1: ("MAPE", format_percent(overall['mape']), "Total de casos"),
+            2: ("Viés", format_percent(overall['bias'], signed=True), "Previsto acima (+) ou abaixo (-) do realizado"),
+            3: ("Dias com realizado", int(overall['days']), ""),
+        })
+
+        st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
+        st.markdown("<div>", unsafe_allow_html=True)
+        submit_chart(
+            'create_forecast_vs_actual_chart',
+            lambda: create_forecast_vs_actual_chart(
+                *accuracy_index.daily(['total'], accuracy_start, accuracy_end)),
+            accuracy_signature)
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+        st.dataframe(pd.DataFrame({
+            'Item': [col.replace('cat_', '') if col.startswith('cat_') else format_channel(col)
+                     for col in accuracy['column']],
+            'Previsto': accuracy['forecast'].round(0),
+            'Realizado': accuracy['actual'].round(0),
+            'MAPE': accuracy['mape'].map(format_percent),
+            'Viés': accuracy['bias'].map(lambda bias: format_percent(bias, signed=True)),
+        }), hide_index=True)
+    else:
+        st.info("Sem realizado para o período selecionado.")
+
+# -------------------- Exportação de Dados --------------------
+
+# Depende de: linhas brutas, datas e anos filtrados e formato (fragmento: trocar o
+# formato não reconstrói os gráficos)
+
+@st.fragment
+def export_section(source_rows, selected_dates, selected_years):
+    st.markdown("### Exportar Dados")
+    download_format = st.radio("Selecione o formato:", available_formats(), horizontal=True)
+    if isinstance(source_rows, ForecastTable):
+        # Backend SQL: a contagem é uma consulta; as linhas só são lidas do banco no clique
+        row_count = source_rows.count(selected_dates, selected_years)
+        filtered_rows = lambda: source_rows.rows(selected_dates, selected_years)
+    else:
+        # A exportação precisa das linhas brutas (fatia do frame em cache, sem cópia)
+        filtered_df = apply_filters(source_rows, selected_dates, selected_years)
+        row_count = len(filtered_df)
+        filtered_rows = lambda: filtered_df
+    try:
+        check_row_limit(row_count, download_format)
+    except ValueError as e:
+        st.warning(str(e))
+        return
+    if row_count:
+        def build_download():
+            # Executado pelo Streamlit só no clique, fora da execução do script
+            export_profiler = RunProfiler(profiler.enabled, kind='export')
+            with export_profiler.stage('generate_export_file'):
+                with generate_export_file(filtered_rows(), download_format) as f:
+                    data = f.read()
+            export_profiler.finish()
+            return data
+
+        mime_type, file_name = EXPORT_FORMATS[download_format]
+        st.download_button(f"Baixar {download_format.upper()}", data=build_download,
+                           file_name=file_name, mime=mime_type)
+    else:
+        st.warning("Nenhum dado para exportar.")
+
+
+export_section(forecast_state['data'], selected_dates, selected_years)
+
+# -------------------- Reconciliação das Categorias --------------------
+
+# Relatório gerado na carga: linhas cujas categorias foram reescaladas para somar o total
+reconciliation = forecast_state['source'].get('reconciliation')
+if reconciliation:
+    with st.sidebar.expander("Reconciliação das categorias"):
+        st.caption(f"{reconciliation['rows_adjusted']:,} de {reconciliation['rows']:,} linhas ajustadas".replace(",", "."))
+        st.dataframe(pd.DataFrame({
+            'Categoria': [cat.replace('cat_', '') for cat in reconciliation['max_drift']],
+            'Desvio máximo': [f"{drift:.1%}".replace(".", ",") for drift in reconciliation['max_drift'].values()],
+        }), hide_index=True)
+
+# -------------------- Perfil de Execução --------------------
+
+# Os gráficos ainda em construção terminam antes do fim da execução (e do resumo do perfil)
+wait_for_charts()
+
+if profiler.enabled:
+    profiler.finish()
+    with st.sidebar.expander("Perfil de execução"):
+        st.dataframe(profiler.summary(), hide_index=True)
+        st.caption(f"Execução {profiler.run_id} · registrado em {profiler.log_path}")
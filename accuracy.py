@@ -0,0 +1,139 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from forecast_catalog import discover_forecasts
+from forecast_data import CATEGORY_COLUMNS, read_actuals
+
+# Realizado: arquivos actuals_*.csv no diretório das previsões, no mesmo layout
+# (ds, y = casos reais, categorias e canais), cobrindo qualquer período
+ACTUALS_PATTERN = "actuals_*.csv"
+
+# Somas acumuladas mantidas por coluna: qualquer período é a diferença de duas linhas
+_ERROR_SUMS = ('forecast', 'actual', 'error', 'ape', 'ape_days')
+
+
+def discover_actuals(directory):
+    return sorted(glob.glob(os.path.join(directory, ACTUALS_PATTERN)))
+
+
+def files_signature(paths):
+    # (caminho, mtime, tamanho) de cada arquivo: muda quando qualquer um muda
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _daily_values(daily, channels):
+    # Uma linha por dia: categorias e total do rollup, canais da matriz dia x canal
+    values = daily[['ds_normalized'] + CATEGORY_COLUMNS + ['total']].copy()
+    rows = channels.rows_for(values['ds_normalized'])
+    channel_values = pd.DataFrame(channels.values[rows], columns=channels.channels, index=values.index)
+    return pd.concat([values, channel_values], axis=1)
+
+
+def forecast_history(directory, aggregates):
+    # Previsões de todos os meses, por dia, a partir dos agregados já calculados
+    # (aggregates(forecast) devolve o estado publicado do ForecastStore: rollup
+    # diário e matriz de canais), sem reler os arquivos. Se dois arquivos cobrem o
+    # mesmo dia, vale o mais recente na ordem do catálogo.
+    frames = []
+    for forecast in discover_forecasts(directory):
+        state = aggregates(forecast)
+        frames.append(_daily_values(state['daily'], state['channels']))
+    if not frames:
+        return pd.DataFrame(columns=['ds_normalized'])
+    history = pd.concat(frames, ignore_index=True).fillna(0)
+    history = history.drop_duplicates('ds_normalized', keep='last')
+    return history.sort_values('ds_normalized', ignore_index=True)
+
+
+def actuals_history(paths):
+    frames = [read_actuals(path) for path in paths]
+    if not frames:
+        return pd.DataFrame(columns=['ds_normalized'])
+    actuals = pd.concat(frames, ignore_index=True).fillna(0)
+    value_columns = [col for col in actuals.columns if col not in ('ds', 'ds_normalized', 'semana')]
+    return actuals.groupby('ds_normalized', sort=True)[value_columns].sum().reset_index()
+
+
+class AccuracyIndex:
+    # Previsto x realizado nos dias presentes nos dois lados (junção por data),
+    # com somas acumuladas de erro, erro percentual absoluto e volumes por coluna.
+    # MAPE e viés de qualquer período e coluna saem de duas buscas binárias.
+
+    def __init__(self, days, columns, forecast, actual):
+        self.days = days
+        self.columns = list(columns)
+        self.forecast = forecast
+        self.actual = actual
+        self._column_pos = {column: i for i, column in enumerate(self.columns)}
+
+        has_actual = actual > 0
+        ape = np.divide(np.abs(forecast - actual), actual, out=np.zeros_like(actual), where=has_actual)
+        per_day = {
+            'forecast': forecast,
+            'actual': actual,
+            'error': forecast - actual,
+            'ape': ape,
+            'ape_days': has_actual.astype(np.float64),
+        }
+        self._cumsum = {}
+        for name in _ERROR_SUMS:
+            cumsum = np.zeros((len(days) + 1, len(self.columns)))
+            np.cumsum(per_day[name], axis=0, out=cumsum[1:])
+            self._cumsum[name] = cumsum
+
+    def _bounds(self, start=None, end=None):
+        lo = 0 if start is None else int(self.days.searchsorted(pd.Timestamp(start).normalize().to_datetime64()))
+        hi = len(self.days) if end is None else int(
+            self.days.searchsorted(pd.Timestamp(end).normalize().to_datetime64(), side='right'))
+        return lo, max(lo, hi)
+
+    def summary(self, columns, start=None, end=None):
+        # Uma linha por coluna: previsto, realizado, MAPE (média do erro percentual
+        # absoluto nos dias com realizado) e viés ((previsto - realizado) / realizado)
+        lo, hi = self._bounds(start, end)
+        cols = [self._column_pos[column] for column in columns if column in self._column_pos]
+        sums = {name: self._cumsum[name][hi, cols] - self._cumsum[name][lo, cols] for name in _ERROR_SUMS}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mape = np.where(sums['ape_days'] > 0, sums['ape'] / sums['ape_days'], np.nan)
+            bias = np.where(sums['actual'] > 0, sums['error'] / sums['actual'], np.nan)
+        return pd.DataFrame({
+            'column': [self.columns[col] for col in cols],
+            'forecast': sums['forecast'],
+            'actual': sums['actual'],
+            'mape': mape,
+            'bias': bias,
+            'days': hi - lo,
+        })
+
+    def daily(self, columns, start=None, end=None):
+        # Série diária previsto x realizado (soma das colunas) para o gráfico
+        lo, hi = self._bounds(start, end)
+        cols = [self._column_pos[column] for column in columns if column in self._column_pos]
+        return (self.days[lo:hi], self.forecast[lo:hi][:, cols].sum(axis=1),
+                self.actual[lo:hi][:, cols].sum(axis=1))
+
+
+def build_accuracy_index(forecasts, actuals):
+    # Junção indexada por data: as duas tabelas já estão ordenadas e sem dias repetidos
+    forecast_days = forecasts['ds_normalized'].to_numpy(dtype='datetime64[ns]')
+    actual_days = actuals['ds_normalized'].to_numpy(dtype='datetime64[ns]')
+    days, forecast_rows, actual_rows = np.intersect1d(
+        forecast_days, actual_days, assume_unique=True, return_indices=True)
+    columns = [col for col in forecasts.columns if col != 'ds_normalized' and col in actuals.columns]
+    return AccuracyIndex(
+        days,
+        columns,
+        forecasts[columns].to_numpy(dtype=np.float64)[forecast_rows],
+        actuals[columns].to_numpy(dtype=np.float64)[actual_rows],
+    )
+
+
+def load_accuracy_index(directory, aggregates):
+    return build_accuracy_index(forecast_history(directory, aggregates), actuals_history(discover_actuals(directory)))
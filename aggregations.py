@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from forecast_data import CATEGORY_COLUMNS, channel_columns
+
+# Colunas somadas no rollup diário (além das categorias)
+ROLLUP_VALUE_COLUMNS = CATEGORY_COLUMNS + ['total', 'count']
+
+
+def build_daily_rollup(df):
+    # Rollup dia x categoria, calculado uma vez por versão dos dados.
+    # Gráficos e painéis apenas fatiam este frame, sem voltar às linhas brutas.
+    value_cols = [col for col in ROLLUP_VALUE_COLUMNS if col in df.columns]
+    grouped = df.groupby('ds_normalized', sort=True)
+    rollup = grouped[value_cols].sum()
+    rollup['rows'] = grouped.size()
+    rollup = rollup.reset_index()
+    return _add_date_parts(rollup)
+
+
+# Partes da data guardadas no rollup (poucas linhas por mês) em inteiros compactos
+DATE_PART_DTYPE = 'int16'
+
+
+def _add_date_parts(rollup):
+    rollup['year'] = rollup['ds_normalized'].dt.year.astype(DATE_PART_DTYPE)
+    rollup['month'] = rollup['ds_normalized'].dt.month.astype(DATE_PART_DTYPE)
+    return rollup
+
+
+def merge_daily_rollup(rollup, appended):
+    # Atualização incremental: só os dias a partir do primeiro dia das linhas novas
+    # são re-somados; o restante do rollup é reaproveitado como está.
+    tail_rollup = build_daily_rollup(appended)
+    if tail_rollup.empty:
+        return rollup
+    pos = rollup['ds_normalized'].searchsorted(tail_rollup['ds_normalized'].iloc[0])
+    overlap = pd.concat([rollup.iloc[pos:], tail_rollup], ignore_index=True)
+    value_cols = [col for col in tail_rollup.columns if col not in ('ds_normalized', 'year', 'month')]
+    merged = overlap.groupby('ds_normalized', sort=True)[value_cols].sum().reset_index()
+    return pd.concat([rollup.iloc[:pos], _add_date_parts(merged)], ignore_index=True)
+
+# -------------------- Matriz densa dia x canal --------------------
+
+
+class ChannelMatrix:
+    # Matriz densa (dias x canais) montada uma vez no carregamento. Filtros e
+    # painéis de canal são fatias e somas NumPy, sem groupby do pandas por render.
+
+    def __init__(self, days, channels, values):
+        self.days = days
+        self.channels = list(channels)
+        self.values = values
+        self._channel_pos = {channel: i for i, channel in enumerate(self.channels)}
+
+    def rows_for(self, dates):
+        # Posições dos dias (já ordenados) na matriz; dias ausentes são descartados
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        if len(self.days) == 0:
+            return np.array([], dtype=np.intp)
+        rows = np.minimum(self.days.searchsorted(dates), len(self.days) - 1)
+        return rows[self.days[rows] == dates]
+
+    def columns_for(self, channels):
+        return np.array([self._channel_pos[c] for c in channels if c in self._channel_pos], dtype=np.intp)
+
+    def submatrix(self, rows, channels):
+        return self.values[np.ix_(rows, self.columns_for(channels))]
+
+    def totals(self, rows, channels):
+        return self.submatrix(rows, channels).sum(axis=0)
+
+    def merge(self, appended):
+        # Atualização incremental com as linhas novas (mesmas colunas de canal)
+        tail = build_channel_matrix(appended)
+        if len(tail.days) == 0:
+            return self
+        if tail.channels != self.channels:
+            raise ValueError("As linhas novas têm canais diferentes da matriz existente")
+        days = np.union1d(self.days, tail.days)
+        values = np.zeros((len(days), len(self.channels)))
+        values[days.searchsorted(self.days)] = self.values
+        values[days.searchsorted(tail.days)] += tail.values
+        return ChannelMatrix(days, self.channels, values)
+
+
+def build_channel_matrix(df):
+    channels = channel_columns(df.columns)
+    dates = df['ds_normalized'].to_numpy(dtype='datetime64[ns]')
+    # O frame já vem ordenado por data: cada dia é um bloco contíguo de linhas
+    valid = ~np.isnat(dates)
+    dates = dates[valid]
+    values = df[channels].to_numpy(dtype=np.float64)[valid]
+    if len(dates) == 0:
+        return ChannelMatrix(np.array([], dtype='datetime64[ns]'), channels, np.zeros((0, len(channels))))
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    matrix = np.add.reduceat(values, starts, axis=0) if len(channels) else np.zeros((len(starts), 0))
+    return ChannelMatrix(dates[starts], channels, matrix)
+
+# -------------------- Janelas móveis (somas acumuladas) --------------------
+
+# Janelas oferecidas no gráfico de 30 dias (1 = sem suavização)
+ROLLING_WINDOWS = [1, 7, 14, 28]
+WEEK = np.timedelta64(7, 'D')
+
+
+class CumulativeRollup:
+    # Somas acumuladas do rollup diário (dias x colunas), com uma linha de zeros no
+    # início. A soma de qualquer janela é a diferença de duas linhas: trocar a janela
+    # ou o período não refaz nenhuma agregação.
+
+    def __init__(self, days, columns, cumsum):
+        self.days = days
+        self.columns = list(columns)
+        self.cumsum = cumsum
+        self._column_pos = {column: i for i, column in enumerate(self.columns)}
+
+    def _bounds(self, end_days, window):
+        # Para cada dia final, as linhas [lo, hi) do rollup dentro de (fim - window, fim]
+        end_days = np.asarray(end_days, dtype='datetime64[ns]')
+        hi = self.days.searchsorted(end_days, side='right')
+        lo = self.days.searchsorted(end_days - np.timedelta64(window - 1, 'D'), side='left')
+        return lo, hi
+
+    def window_sums(self, end_days, window, columns):
+        lo, hi = self._bounds(end_days, window)
+        cols = [self._column_pos[column] for column in columns]
+        return self.cumsum[hi][:, cols] - self.cumsum[lo][:, cols]
+
+    def rolling_mean(self, end_days, window, columns):
+        # Média pelos dias com dados dentro da janela (o início do arquivo tem janelas incompletas)
+        lo, hi = self._bounds(end_days, window)
+        cols = [self._column_pos[column] for column in columns]
+        days_in_window = np.maximum(hi - lo, 1)[:, None]
+        return (self.cumsum[hi][:, cols] - self.cumsum[lo][:, cols]) / days_in_window
+
+    def rolling_frame(self, end_days, window, columns):
+        end_days = np.asarray(end_days, dtype='datetime64[ns]')
+        frame = pd.DataFrame(self.rolling_mean(end_days, window, columns), columns=columns)
+        frame.insert(0, 'ds_normalized', end_days)
+        return frame
+
+    def week_over_week(self, end_day, columns):
+        # Soma dos 7 dias até end_day e dos 7 dias anteriores, por coluna
+        end_day = np.datetime64(end_day, 'ns')
+        current, previous = self.window_sums([end_day, end_day - WEEK], 7, columns)
+        return current, previous
+
+    def merge(self, rollup, since):
+        # Atualização incremental: as linhas do rollup anteriores a `since` não mudaram
+        # (ver merge_daily_rollup), então só o final das somas acumuladas é refeito
+        pos = int(self.days.searchsorted(np.datetime64(since, 'ns')))
+        values = rollup[self.columns].iloc[pos:].to_numpy(dtype=np.float64)
+        tail = self.cumsum[pos] + np.cumsum(values, axis=0)
+        days = rollup['ds_normalized'].to_numpy(dtype='datetime64[ns]')
+        return CumulativeRollup(days, self.columns, np.vstack([self.cumsum[:pos + 1], tail]))
+
+
+def build_cumulative_rollup(rollup):
+    columns = [col for col in ROLLUP_VALUE_COLUMNS if col in rollup.columns]
+    values = rollup[columns].to_numpy(dtype=np.float64)
+    cumsum = np.zeros((len(values) + 1, len(columns)))
+    np.cumsum(values, axis=0, out=cumsum[1:])
+    return CumulativeRollup(rollup['ds_normalized'].to_numpy(dtype='datetime64[ns]'), columns, cumsum)
+
+# -------------------- Cubo ano x dia x categoria --------------------
+
+YEAR_ALIGNMENTS = ('day', 'weekday')
+
+
+class YearCube:
+    # Cubo (anos x dia do mês x colunas) do mesmo mês em cada ano, montado uma vez
+    # por versão dos dados; dias sem dados ficam NaN. O eixo do dia segue o ano de
+    # referência (o mais recente): em 'day' cada ano é alinhado pelo dia do mês e em
+    # 'weekday' pelo dia da semana (deslocado no número inteiro de semanas mais próximo).
+
+    def __init__(self, years, month, columns, cubes):
+        self.years = list(years)
+        self.month = month
+        self.columns = list(columns)
+        self.cubes = cubes
+        self._year_pos = {year: i for i, year in enumerate(self.years)}
+        self._column_pos = {column: i for i, column in enumerate(self.columns)}
+
+    def values(self, years, columns, align='day'):
+        year_rows = [self._year_pos[year] for year in years if year in self._year_pos]
+        cols = [self._column_pos[column] for column in columns]
+        return self.cubes[align][np.ix_(year_rows, np.arange(31), cols)]
+
+    def daily_totals(self, years, columns, align='day'):
+        # Série diária (anos x 31) somando as colunas; NaN onde o ano não tem o dia
+        values = self.values(years, columns, align)
+        return np.where(np.isnan(values).all(axis=2), np.nan, np.nansum(values, axis=2))
+
+    def common_totals(self, years, columns, align='day'):
+        # Totais por ano (anos x colunas) só com os dias presentes em todos os anos,
+        # para que a variação compare períodos equivalentes
+        values = self.values(years, columns, align)
+        common = ~np.isnan(values).any(axis=(0, 2))
+        return values[:, common, :].sum(axis=1), int(common.sum())
+
+
+def build_year_cube(rollup, month=None):
+    columns = [col for col in ROLLUP_VALUE_COLUMNS if col in rollup.columns]
+    if month is None:
+        month = int(rollup['month'].iloc[-1]) if len(rollup) else 1
+    in_month = rollup[rollup['month'] == month]
+    years = sorted(int(year) for year in in_month['year'].unique())
+    cubes = {align: np.full((len(years), 31, len(columns)), np.nan) for align in YEAR_ALIGNMENTS}
+    if not years:
+        return YearCube(years, month, columns, cubes)
+
+    values = in_month[columns].to_numpy(dtype=np.float64)
+    year_rows = np.searchsorted(years, in_month['year'].to_numpy())
+    cubes['day'][year_rows, in_month['ds_normalized'].dt.day.to_numpy() - 1] = values
+
+    # Dia da semana: cada dia do mês de referência recebe o dia do ano anterior
+    # que cai no mesmo dia da semana (busca binária nos dias do rollup)
+    days = in_month['ds_normalized'].to_numpy(dtype='datetime64[ns]')
+    reference = pd.Timestamp(year=years[-1], month=month, day=1)
+    reference_days = pd.date_range(reference, periods=reference.days_in_month, freq='D').to_numpy()
+    for i, year in enumerate(years):
+        offset_days = (reference - pd.Timestamp(year=year, month=month, day=1)).days
+        shift = np.timedelta64(7 * round(offset_days / 7), 'D')
+        targets = reference_days - shift
+        pos = np.minimum(days.searchsorted(targets), len(days) - 1)
+        found = days[pos] == targets
+        cubes['weekday'][i, np.flatnonzero(found)] = values[pos[found]]
+    return YearCube(years, month, columns, cubes)
@@ -0,0 +1,311 @@
+import argparse
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: sem ru_maxrss
+    resource = None
+
+# Os módulos do dashboard ficam na raiz do repositório
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from aggregations import (  # noqa: E402
+    build_channel_matrix,
+    build_cumulative_rollup,
+    build_daily_rollup,
+    build_year_cube,
+)
+from charts import (  # noqa: E402
+    create_30_day_category_smoothed_line_chart,
+    create_big_bar_chart,
+    create_channel_heatmap,
+    create_daily_sum_bar_charts,
+    create_total_sum_bar_chart,
+)
+from filters import apply_filters, project_categories  # noqa: E402
+from forecast_data import CATEGORY_COLUMNS, load_forecast, preprocess_forecast  # noqa: E402
+from forecast_db import ForecastDatabase, default_sql_backend  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Cabeçalho igual ao dos arquivos reais (latin1, com acentos)
+SOURCE_CATEGORIES = [
+    "cat_cancelamento", "cat_informação", "cat_reclamação", "cat_troca",
+    "cat_preventiva", "cat_pré-venda", "cat_solicitação",
+]
+SOURCE_CHANNELS = [
+    "magazine_luiza", "shopee", "clube_de_compras", "mercado_livre", "philco", "cnova",
+    "britânia", "infoar", "b2w", "amazon", "philco_club", "não_informado", "banco_inter",
+    "fast", "camicado", "carrefour", "renner", "coopera", "senff", "angeloni", "colombo",
+    "leroy_merlin", "casa_e_vídeo", "le_biscuit", "livelo", "sicredi",
+    "magazine_luiza_prime", "bradesco",
+]
+SOURCE_COLUMNS = ["ds", "y"] + SOURCE_CATEGORIES + ["semana"] + SOURCE_CHANNELS
+
+GENERATE_CHUNK_ROWS = 250_000
+
+# -------------------- Geração de dados sintéticos --------------------
+
+
+def generate_forecast_csv(path, rows, years=(2021, 2022, 2023, 2024, 2025), seed=0):
+    # Linhas distribuídas uniformemente em fevereiro de cada ano, ordenadas por ds,
+    # com ';' como separador, vírgula decimal e cabeçalho em latin1
+    rng = np.random.default_rng(seed)
+    channel_weights = rng.dirichlet(np.ones(len(SOURCE_CHANNELS)))
+    category_weights = rng.dirichlet(np.ones(len(SOURCE_CATEGORIES)) * 2)
+    rows_per_year = -(-rows // len(years))
+    feb_seconds = 28 * 24 * 3600
+
+    with open(path, "w", encoding="latin1", newline="") as f:
+        f.write(";".join(SOURCE_COLUMNS) + "\n")
+        for start in range(0, rows, GENERATE_CHUNK_ROWS):
+            index = np.arange(start, min(start + GENERATE_CHUNK_ROWS, rows))
+            n = len(index)
+            offset = ((index % rows_per_year) * feb_seconds // rows_per_year).astype("timedelta64[s]")
+            first_day = np.array([np.datetime64(f"{y}-02-01") for y in years])[index // rows_per_year]
+            ds = pd.to_datetime(first_day + offset)
+
+            categories = rng.gamma(2.0, 40.0, size=(n, 1)) * category_weights * rng.uniform(0.5, 1.5, size=(n, len(SOURCE_CATEGORIES)))
+            categories[rng.random(categories.shape) < 0.1] = 0
+            # O total não bate exatamente com a soma das categorias, como nos arquivos reais
+            total = categories.sum(axis=1) * rng.uniform(0.9, 1.1, size=n)
+            channels = total[:, None] * channel_weights * rng.uniform(0.5, 1.5, size=(n, len(SOURCE_CHANNELS)))
+
+            chunk = pd.DataFrame(
+                np.column_stack([total, categories, rng.random(n), channels]),
+                columns=SOURCE_COLUMNS[1:],
+            )
+            chunk.insert(0, "ds", ds)
+            chunk.to_csv(f, sep=";", decimal=",", index=False, header=False,
+                         float_format="%.6f", date_format="%Y-%m-%d %H:%M:%S")
+    return path
+
+
+def dataset_path(size_name, seed=0):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"forecast_bench_{size_name}_s{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Gerando {path} ({SIZES[size_name]:,} linhas)...", flush=True)
+        tmp_path = path + ".tmp"
+        generate_forecast_csv(tmp_path, SIZES[size_name], seed=seed)
+        os.replace(tmp_path, path)
+    return path
+
+# -------------------- Medição --------------------
+
+
+def measure(func, repeat):
+    # Tempo: mediana de `repeat` execuções sem tracemalloc.
+    # Memória: uma execução extra com tracemalloc para o pico de alocação.
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        "seconds": float(np.median(timings)),
+        "min_seconds": float(np.min(timings)),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def _ingest_max_rss(backend, db_path, path):
+    # Executado em um processo novo (spawn): o ru_maxrss não pode ser zerado dentro do
+    # processo do benchmark e inclui as alocações nativas do banco, que o tracemalloc não vê
+    database = ForecastDatabase(db_path, backend)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    database.refresh(path, month=2)
+    database.close()
+    return before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_size(size_name, repeat, seed=0):
+    path = dataset_path(size_name, seed)
+    rows = SIZES[size_name]
+    results = {}
+
+    def record(stage, func, stage_repeat=repeat, stage_rows=rows):
+        result, stats = measure(func, stage_repeat)
+        stats["rows"] = stage_rows
+        stats["rows_per_second"] = stage_rows / stats["seconds"] if stats["seconds"] else None
+        results[stage] = stats
+        print(f"  {stage:<45} {stats['seconds'] * 1000:>10.1f} ms  "
+              f"{stats['peak_mb']:>9.1f} MB  {stats['rows_per_second'] or 0:>14,.0f} linhas/s", flush=True)
+        return result
+
+    snapshot_dir = tempfile.mkdtemp(prefix="bench_snapshots_")
+    try:
+        # Ingestão: CSV completo, ingestão em blocos, gravação e leitura do snapshot
+        df = record("preprocess_forecast", lambda: preprocess_forecast(path, month=2))
+        record("preprocess_forecast_chunked", lambda: preprocess_forecast(path, chunksize=200_000, month=2))
+        def load_cold():
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            return load_forecast(path, snapshot_dir=snapshot_dir, month=2)
+
+        record("load_forecast_cold", load_cold, 1)
+        record("load_forecast_snapshot", lambda: load_forecast(path, snapshot_dir=snapshot_dir, month=2))
+
+        # Agregados calculados uma vez por versão dos dados
+        daily = record("build_daily_rollup", lambda: build_daily_rollup(df))
+        matrix = record("build_channel_matrix", lambda: build_channel_matrix(df))
+        rolling = record("build_cumulative_rollup", lambda: build_cumulative_rollup(daily), stage_rows=len(daily))
+        record("build_year_cube", lambda: build_year_cube(daily, 2), stage_rows=len(daily))
+
+        # Lógica de filtros da sidebar: metade do período, todos os anos exceto o primeiro
+        days = daily["ds_normalized"]
+        selected_dates = (days.iloc[len(days) // 4].date(), days.iloc[3 * len(days) // 4].date())
+        selected_years = sorted(daily["year"].unique().tolist())[1:]
+        categories = project_categories(CATEGORY_COLUMNS, CATEGORY_COLUMNS[:4])
+        filtered_daily = record("apply_filters_daily",
+                                lambda: apply_filters(daily, selected_dates, selected_years),
+                                stage_rows=len(daily))
+        record("apply_filters_rows", lambda: apply_filters(df, selected_dates, selected_years))
+        channel_rows = record("channel_rows_for", lambda: matrix.rows_for(filtered_daily["ds_normalized"]),
+                              stage_rows=len(filtered_daily))
+        smoothed = record("rolling_frame_7d",
+                          lambda: rolling.rolling_frame(filtered_daily["ds_normalized"], 7, categories),
+                          stage_rows=len(filtered_daily))
+
+        # Backend SQL local (DuckDB, ou SQLite sem ele): ingestão em blocos e as mesmas
+        # consultas do dashboard, empurradas para o banco
+        backend = default_sql_backend()
+        db_path = os.path.join(snapshot_dir, f"bench.{backend}")
+        databases = []
+
+        def ingest_cold():
+            # Banco novo a cada execução (como load_cold): sem isso a execução extra do
+            # tracemalloc cai no atalho de mtime/tamanho e não ingere nada
+            if databases:
+                databases.pop().close()
+            for db_file in glob.glob(db_path + "*"):
+                os.remove(db_file)
+            databases.append(ForecastDatabase(db_path, backend))
+            return databases[-1].refresh(path, month=2)
+
+        record(f"{backend}_ingest", ingest_cold, 1)
+        if resource is not None:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                rss_before, rss_peak = pool.apply(_ingest_max_rss, (backend, db_path + ".rss", path))
+            results[f"{backend}_ingest"].update(max_rss_mb=rss_peak, rss_growth_mb=rss_peak - rss_before)
+            print(f"  {backend + '_ingest (ru_maxrss)':<45} {'':>10}     {rss_peak:>9.1f} MB  "
+                  f"(+{rss_peak - rss_before:.1f} MB na ingestão)", flush=True)
+        table = databases[-1].refresh(path, month=2)[0]
+        record(f"{backend}_daily_rollup", table.daily_rollup)
+        record(f"{backend}_channel_matrix", table.channel_matrix)
+        record(f"{backend}_count_rows", lambda: table.count(selected_dates, selected_years))
+        record(f"{backend}_rows", lambda: table.rows(selected_dates, selected_years))
+
+        # Construção dos gráficos (sem navegador)
+        chart_rows = len(filtered_daily)
+        record("create_total_sum_bar_chart",
+               lambda: create_total_sum_bar_chart(filtered_daily, categories), stage_rows=chart_rows)
+        record("create_daily_sum_bar_charts",
+               lambda: create_daily_sum_bar_charts(filtered_daily, categories), stage_rows=chart_rows)
+        record("create_big_bar_chart",
+               lambda: create_big_bar_chart(filtered_daily, categories), stage_rows=chart_rows)
+        record("create_30_day_category_smoothed_line_chart",
+               lambda: create_30_day_category_smoothed_line_chart(smoothed, categories, 7), stage_rows=chart_rows)
+        record("create_channel_heatmap",
+               lambda: create_channel_heatmap(matrix.days[channel_rows], matrix.channels,
+                                              matrix.submatrix(channel_rows, matrix.channels)),
+               stage_rows=chart_rows)
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return results
+
+# -------------------- Baseline --------------------
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size_name, stages in results.items():
+        for stage, stats in stages.items():
+            reference = baseline.get("results", {}).get(size_name, {}).get(stage)
+            if not reference:
+                continue
+            ratio = stats["seconds"] / reference["seconds"] if reference["seconds"] else 1.0
+            mem_ratio = stats["peak_mb"] / reference["peak_mb"] if reference["peak_mb"] else 1.0
+            flag = ""
+            if ratio > 1 + tolerance or mem_ratio > 1 + tolerance:
+                flag = "  <-- REGRESSÃO"
+                regressions.append((size_name, stage, ratio, mem_ratio))
+            print(f"  {size_name:>4} {stage:<45} tempo x{ratio:5.2f}  memória x{mem_ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão, filtros e gráficos do dashboard.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k", "1m"],
+                        help="Tamanhos dos CSVs sintéticos (10m é opcional por ser lento de gerar).")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por etapa (mediana).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Arquivo JSON do baseline.")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como novo baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Piora relativa aceita antes de acusar regressão (0.2 = 20%%).")
+    parser.add_argument("--output", help="Grava os resultados desta execução em JSON.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size_name in args.sizes:
+        print(f"[{size_name}] {SIZES[size_name]:,} linhas", flush=True)
+        results[size_name] = run_size(size_name, args.repeat, args.seed)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparação com o baseline de {baseline.get('created')}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} etapa(s) acima da tolerância de {args.tolerance:.0%}.")
+            return 1
+    else:
+        print(f"Sem baseline em {args.baseline}; use --save-baseline para criar um.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
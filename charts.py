@@ -0,0 +1,385 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+# -------------------- Cache de figuras --------------------
+
+# As figuras ficam em um LRU no nível do módulo (o Home.py é reexecutado a cada
+# interação, este módulo não). A chave combina a versão dos dados com o estado
+# dos filtros, então só os gráficos cujas entradas mudaram são reconstruídos.
+FIGURE_CACHE_SIZE = 64
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def figure_cache_key(chart_name, data_version, *params):
+    return hashlib.sha1(repr((chart_name, data_version) + params).encode()).hexdigest()
+
+
+def memoized_figure(key, build):
+    with _figure_cache_lock:
+        fig = _figure_cache.get(key)
+        if fig is not None:
+            _figure_cache.move_to_end(key)
+            return fig
+    fig = build()
+    if getattr(fig, '_build_error', False):
+        # Figura de erro: não entra no cache, senão as próximas execuções a mostrariam
+        # sem a mensagem do st.error (que só é emitida quando o gráfico é construído)
+        return fig
+    with _figure_cache_lock:
+        _figure_cache[key] = fig
+        _figure_cache.move_to_end(key)
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+# -------------------- Estilo comum dos gráficos --------------------
+
+
+def apply_chart_layout(fig, date_axis=False, **overrides):
+    layout = dict(
+        height=350,
+        title_x=0.1,
+        margin=dict(b=100),
+        title_font=dict(color='white'),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin_t=50, margin_b=50, margin_l=0, margin_r=0,
+        xaxis_title=None, yaxis_title=None,
+        xaxis=dict(showgrid=False, zeroline=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+    )
+    if date_axis:
+        layout['xaxis'].update(tickformat='%b %d', showticklabels=True)
+    # Um título em texto substituiria o objeto inteiro (perdendo title_x e a fonte)
+    if isinstance(overrides.get('title'), str):
+        overrides['title_text'] = overrides.pop('title')
+    layout.update(overrides)
+    fig.update_layout(**layout)
+    return fig
+
+
+def _bar_labels(fig, bars=0):
+    # Formatação: sem decimais, separador de milhar (omitidos quando há barras demais)
+    if bars > BAR_LABELS_MAX_BARS:
+        return fig
+    fig.update_traces(texttemplate='%{y:,.0f}', textposition='outside', textfont=dict(color='white'))
+    return fig
+
+
+def _empty_bar_chart(title="Sem dados para exibir com os filtros selecionados"):
+    fig = px.bar(title=title)
+    fig.update_layout(yaxis_range=[0, 1])  # Define um intervalo mínimo para o eixo Y
+    return fig
+
+
+def _error_chart(e, chart=px.bar, date_axis=False, **overrides):
+    st.error(f"Ocorreu um erro ao gerar o gráfico: {e}")
+    fig = chart(title="Erro ao gerar o gráfico")  # Crie um gráfico de erro
+    fig._build_error = True  # Marca para o memoized_figure não guardar a figura
+    return apply_chart_layout(fig, date_axis=date_axis, **overrides)
+
+
+def format_channel(channel):
+    return channel.replace('_', ' ').title()
+
+# -------------------- Nível de detalhe (LOD) --------------------
+
+# Acima destes limites as séries são reduzidas antes de ir para o navegador,
+# mantendo o JSON do Plotly e o tempo de renderização limitados
+LINE_MAX_POINTS = 2_000        # pontos por linha após o LTTB
+WEBGL_MIN_POINTS = 1_000       # a partir daqui as linhas usam Scattergl, sem marcadores
+MARKERS_MAX_POINTS = 120       # marcadores só em séries curtas
+BAR_LABELS_MAX_BARS = 40       # rótulos de texto só em gráficos com poucas barras
+
+# Resolução temporal pelo tamanho do período: (dias máximos, frequência, formato do eixo)
+TIME_RESOLUTIONS = [
+    (92, 'D', '%b %d'),
+    (731, 'W-MON', '%d/%m/%y'),
+    (None, 'MS', '%b %Y'),
+]
+
+
+def time_resolution(days):
+    # Escolhe dia, semana ou mês conforme o intervalo coberto pelos dias
+    days = pd.DatetimeIndex(days)
+    span = (days.max() - days.min()).days if len(days) else 0
+    for max_days, freq, tickformat in TIME_RESOLUTIONS:
+        if max_days is None or span <= max_days:
+            return freq, tickformat
+
+
+def resample_days(days, values, freq):
+    # Soma linhas diárias (dias x colunas) em semanas ou meses
+    if freq == 'D':
+        return pd.DatetimeIndex(days), values
+    frame = pd.DataFrame(values, index=pd.DatetimeIndex(days)).resample(freq, label='left', closed='left').sum(min_count=1)
+    return frame.index, frame.to_numpy()
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: escolhe `threshold` pontos que preservam o
+    # formato visual da série (primeiro e último pontos sempre mantidos)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x).astype(np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def line_trace(x, y, line=None, **kwargs):
+    # Scatter de linha com LOD: LTTB acima de LINE_MAX_POINTS e WebGL para séries longas
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) > LINE_MAX_POINTS:
+        keep = lttb_indices(x.astype('datetime64[ns]').astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x,
+                            y, LINE_MAX_POINTS)
+        x, y = x[keep], y[keep]
+    trace = go.Scattergl if len(y) >= WEBGL_MIN_POINTS else go.Scatter
+    mode = 'lines+markers' if len(y) <= MARKERS_MAX_POINTS else 'lines'
+    line = dict(line or {})
+    if trace is go.Scattergl:
+        line.pop('shape', None)  # Scattergl não suporta spline
+    return trace(x=x, y=y, mode=mode, line=line, **kwargs)
+
+# -------------------- Funções de Gráficos --------------------
+
+
+def create_total_sum_bar_chart(data, categories):
+    if data.empty:
+        return _empty_bar_chart()
+    try:
+        category_sums = data[categories].sum().reset_index()
+        category_sums.rename(columns={'index': 'category'}, inplace=True)
+        category_sums['category'] = category_sums['category'].str.replace('cat_', '')
+        category_sums.columns = ['category', 'total']
+        fig = px.bar(category_sums, x='category', y='total',
+                     title='Total de Casos por Categoria',
+                     color_discrete_sequence=['#CD9A33'],
+                     text_auto=False)  # Desativa o text_auto padrão
+        _bar_labels(fig, len(category_sums))
+        return apply_chart_layout(
+            fig, font=dict(size=10),
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True),  # Escala dinâmica
+        )
+    except Exception as e:
+        return _error_chart(e, font=dict(size=10))
+
+
+def create_daily_sum_bar_charts(data, categories):
+    if data.empty:
+        return _empty_bar_chart()
+    today = pd.to_datetime('today').normalize()
+    last_7_days = pd.date_range(start=today, periods=7, freq='D')
+    df_temp = data[data['ds_normalized'].isin(last_7_days)]
+    if df_temp.empty:
+        return px.bar(title="Sem dados para exibir nos próximos 7 dias")
+    try:
+        # Os dados já vêm agregados por dia (rollup diário)
+        daily_sums = pd.DataFrame({
+            'Dia': df_temp['ds_normalized'],
+            'daily_sum': df_temp[categories].sum(axis=1),
+        })
+        fig = px.bar(daily_sums, x='Dia', y='daily_sum',
+                     title='Contagem Diária de Casos (Próximos 7 Dias)',
+                     color_discrete_sequence=['#CD9A33'],
+                     text_auto=False)  # Desativa o text_auto padrão
+        _bar_labels(fig, len(daily_sums))
+        return apply_chart_layout(
+            fig, date_axis=True,
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True),  # Escala dinâmica
+        )
+    except Exception as e:
+        return _error_chart(e, date_axis=True)
+
+
+def create_big_bar_chart(data, categories=None):
+    if data.empty:
+        return _empty_bar_chart()
+    max_date = data['ds_normalized'].max()
+    first_day_month = max_date.replace(day=1)
+    df_temp = data[data['ds_normalized'] >= first_day_month]
+    if df_temp.empty:
+        return px.bar(title="Sem dados para exibir no último mês")
+    try:
+        pie_categories = categories or ['cat_cancelamento', 'cat_informacao', 'cat_reclamacao',
+                                        'cat_troca', 'cat_preventiva', 'cat_pre_venda', 'cat_solicitacao']
+        daily_sums = pd.DataFrame({
+            'Dia': df_temp['ds_normalized'],
+            'monthly_sum': df_temp[pie_categories].sum(axis=1),
+        })
+        fig = px.bar(daily_sums, x='Dia', y='monthly_sum',
+                     title='Contagem Diária de Casos (1 Mês)',
+                     color_discrete_sequence=['#CD9A33'],
+                     text_auto=False)  # Desativa o text_auto padrão
+        _bar_labels(fig, len(daily_sums))
+        return apply_chart_layout(
+            fig, date_axis=True,
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, autorange=True),  # Escala dinâmica
+        )
+    except Exception as e:
+        return _error_chart(e, date_axis=True)
+
+# Gráfico de linha para os últimos 30 dias (média móvel vinda das somas acumuladas)
+
+
+def create_30_day_category_smoothed_line_chart(data, categories=None, window=1):
+    # data: uma linha por dia com as categorias já suavizadas (ver CumulativeRollup.rolling_frame)
+    if 'ds_normalized' not in data.columns:
+        return px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
+
+    max_date = data['ds_normalized'].max()
+    if pd.isna(max_date):
+        return px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
+
+    last_30_days = pd.date_range(end=max_date, periods=30, freq='D')
+    df_temp = data[data['ds_normalized'].isin(last_30_days)]
+    if df_temp.empty:
+        return px.line(title="Sem dados para exibir nos últimos 30 dias", height=350)
+
+    try:
+        category_cols = categories or [
+            "cat_cancelamento",
+            "cat_informacao",
+            "cat_reclamacao",
+            "cat_troca",
+            "cat_preventiva",
+            "cat_pre_venda",
+            "cat_solicitacao"
+        ]
+        title = ('Contagem Diária de Casos por Categoria (Últimos 30 Dias)' if window <= 1
+                 else f'Média Móvel de {window} Dias por Categoria (Últimos 30 Dias)')
+        # Um trace por categoria direto das colunas, sem melt
+        colors = px.colors.qualitative.Pastel
+        fig = go.Figure([
+            line_trace(
+                df_temp['ds_normalized'],
+                df_temp[col],
+                name=col.replace('cat_', ''),
+                line=dict(shape='spline', color=colors[i % len(colors)]),
+                hovertemplate='%{x|%b %d}<br>%{y:,.0f}<extra>%{fullData.name}</extra>',
+            )
+            for i, col in enumerate(category_cols)
+        ])
+        return apply_chart_layout(fig, date_axis=True, title=title, font=dict(size=10), legend_title=None)
+    except Exception as e:
+        return _error_chart(e, chart=px.line, date_axis=True)
+
+# Comparação entre meses: total diário alinhado pelo dia do mês
+
+
+def create_month_comparison_chart(rollups, categories):
+    frames = [
+        pd.DataFrame({
+            'Dia do mês': rollup['ds_normalized'].dt.day,
+            'count': rollup[categories].sum(axis=1),
+            'Mês': label,
+        })
+        for label, rollup in rollups if not rollup.empty
+    ]
+    if not frames:
+        return px.line(title="Sem dados para comparar", height=350)
+    comparison = pd.concat(frames, ignore_index=True)
+    fig = px.line(
+        comparison,
+        x='Dia do mês',
+        y='count',
+        color='Mês',
+        title='Comparação Diária entre Meses',
+        color_discrete_sequence=['#CD9A33'] + px.colors.qualitative.Pastel,
+        hover_data={"count": ":,.0f"},
+    )
+    fig.update_traces(mode='lines+markers')
+    return apply_chart_layout(
+        fig, font=dict(size=10), legend_title=None,
+        xaxis=dict(showgrid=False, zeroline=False, dtick=1),
+    )
+
+# Comparação entre anos: uma linha por ano sobre os dias do mês de referência
+
+
+def create_year_over_year_chart(years, daily_totals, align='day'):
+    if len(years) == 0 or np.isnan(daily_totals).all():
+        return px.line(title="Sem dados para comparar entre anos", height=350)
+    days = np.arange(1, daily_totals.shape[1] + 1)
+    colors = px.colors.qualitative.Pastel
+    fig = go.Figure([
+        line_trace(
+            days,
+            daily_totals[i],
+            name=str(year),
+            # O ano de referência (o mais recente) em destaque
+            line=dict(color='#CD9A33' if i == len(years) - 1 else colors[i % len(colors)],
+                      width=3 if i == len(years) - 1 else 2),
+            hovertemplate='Dia %{x}<br>%{y:,.0f}<extra>%{fullData.name}</extra>',
+        )
+        for i, year in enumerate(years)
+    ])
+    alignment = 'Dia da Semana' if align == 'weekday' else 'Dia do Mês'
+    return apply_chart_layout(
+        fig, title=f'Comparação entre Anos (Alinhado por {alignment})',
+        font=dict(size=10), legend_title=None,
+        xaxis=dict(showgrid=False, zeroline=False, dtick=1),
+    )
+
+# Previsto x realizado: total diário das colunas selecionadas
+
+
+def create_forecast_vs_actual_chart(days, forecast, actual):
+    if len(days) == 0:
+        return px.line(title="Sem realizado para o período selecionado", height=350)
+    days = pd.DatetimeIndex(days)
+    fig = go.Figure([
+        line_trace(days, actual, name='Realizado', line=dict(color='white'),
+                   hovertemplate='%{x|%b %d}<br>%{y:,.0f}<extra>Realizado</extra>'),
+        line_trace(days, forecast, name='Previsto', line=dict(color='#CD9A33', dash='dash'),
+                   hovertemplate='%{x|%b %d}<br>%{y:,.0f}<extra>Previsto</extra>'),
+    ])
+    return apply_chart_layout(
+        fig, date_axis=True, title='Previsto x Realizado', font=dict(size=10), legend_title=None)
+
+# Heatmap de casos por canal e dia (matriz densa dia x canal)
+
+
+def create_channel_heatmap(days, channels, values):
+    if len(days) == 0 or len(channels) == 0:
+        return _empty_bar_chart()
+    # Períodos longos são agregados por semana ou mês (colunas do heatmap limitadas)
+    freq, tickformat = time_resolution(days)
+    days, values = resample_days(days, values, freq)
+    period = {'D': 'Dia', 'W-MON': 'Semana', 'MS': 'Mês'}[freq]
+    fig = go.Figure(go.Heatmap(
+        z=values.T,
+        x=days,
+        y=[format_channel(channel) for channel in channels],
+        colorscale=[[0, '#2b2b2b'], [1, '#CD9A33']],
+        hovertemplate='%{y}<br>%{x|' + tickformat + '}<br>%{z:,.0f} casos<extra></extra>',
+        showscale=False,
+    ))
+    return apply_chart_layout(
+        fig,
+        title=f'Casos por Canal e {period}',
+        height=max(350, 22 * len(channels) + 100),
+        font=dict(size=10),
+        xaxis=dict(showgrid=False, zeroline=False, tickformat=tickformat),
+        yaxis=dict(showgrid=False, zeroline=False, autorange='reversed'),
+    )
@@ -0,0 +1,126 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet só é oferecido com pyarrow instalado
+    pa = pq = None
+
+# Linhas escritas por vez: o arquivo é gerado em blocos, sem montar tudo em memória
+EXPORT_CHUNK_ROWS = 50_000
+# Amostra usada para estimar a largura das colunas de texto no XLSX
+WIDTH_SAMPLE_ROWS = 1_000
+
+# Colunas derivadas que não vão para a planilha
+XLSX_DROP_COLUMNS = ['year', 'month', 'ds_normalized']
+# Limite de linhas de uma planilha do Excel (1.048.576), descontado o cabeçalho
+XLSX_MAX_ROWS = 1_048_575
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'dashboard_data.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'dashboard_data.xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'dashboard_data.parquet'),
+}
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or pq is not None]
+
+
+def check_row_limit(row_count, file_format):
+    # O xlsxwriter não grava além do limite do Excel (write_row devolve -1): a exportação
+    # seria truncada em silêncio, então o XLSX é recusado antes de começar
+    if file_format == 'xlsx' and row_count > XLSX_MAX_ROWS:
+        raise ValueError(
+            f"O XLSX comporta no máximo {XLSX_MAX_ROWS:,} linhas e a seleção tem {row_count:,}. "
+            "Reduza o período ou exporte em CSV ou Parquet.".replace(',', '.')
+        )
+
+
+def _chunks(data):
+    for start in range(0, len(data), EXPORT_CHUNK_ROWS):
+        yield data.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def estimate_column_widths(data):
+    # Larguras estimadas sem converter a coluna inteira para texto:
+    # numéricas pelo número de dígitos do maior valor, datas com largura fixa,
+    # texto pela maior string de uma amostra
+    sample = data.head(WIDTH_SAMPLE_ROWS)
+    widths = []
+    for column in data.columns:
+        series = data[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            width = 19
+        elif pd.api.types.is_numeric_dtype(series):
+            max_abs = np.nanmax(np.abs(series.to_numpy(dtype=np.float64))) if len(series) else 0
+            digits = int(np.log10(max_abs)) + 1 if np.isfinite(max_abs) and max_abs >= 1 else 1
+            width = digits + (0 if pd.api.types.is_integer_dtype(series) else 7)
+        else:
+            width = int(sample[column].astype(str).str.len().max()) if len(sample) else 0
+        widths.append(max(width, len(str(column))) + 2)
+    return widths
+
+
+def _write_csv(data, f):
+    data.to_csv(f, index=False, encoding='utf-8', chunksize=EXPORT_CHUNK_ROWS)
+
+
+def _write_xlsx(data, f):
+    import xlsxwriter
+
+    check_row_limit(len(data), 'xlsx')
+    data = data.drop(columns=[col for col in XLSX_DROP_COLUMNS if col in data.columns])
+    # constant_memory: cada linha é gravada direto no arquivo temporário do xlsxwriter
+    workbook = xlsxwriter.Workbook(f, {
+        'constant_memory': True,
+        'nan_inf_to_errors': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    worksheet = workbook.add_worksheet('Dashboard Data')
+    for col_idx, width in enumerate(estimate_column_widths(data)):
+        worksheet.set_column(col_idx, col_idx, width)
+    worksheet.write_row(0, 0, list(data.columns))
+    row_idx = 1
+    for chunk in _chunks(data):
+        # NaN/NaT viram células vazias
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            # write_row para na primeira célula com erro e devolve o código (-1: fora dos limites)
+            error = worksheet.write_row(row_idx, 0, row)
+            if error:
+                raise ValueError(f"Falha ao gravar a linha {row_idx + 1} do XLSX (código {error}).")
+            row_idx += 1
+    workbook.close()
+
+
+def _write_parquet(data, f):
+    writer = None
+    for chunk in _chunks(data):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(f, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+_WRITERS = {'csv': _write_csv, 'xlsx': _write_xlsx, 'parquet': _write_parquet}
+
+
+def generate_export_file(data, file_format):
+    # Gera a exportação em um arquivo temporário (apagado ao ser fechado) e o
+    # devolve posicionado no início, pronto para leitura
+    if file_format not in _WRITERS:
+        raise ValueError(f"Formato de exportação desconhecido: {file_format}")
+    f = tempfile.TemporaryFile(mode='w+b')
+    try:
+        _WRITERS[file_format](data, f)
+    except Exception:
+        f.close()
+        raise
+    f.seek(0)
+    return f
@@ -0,0 +1,55 @@
+import pandas as pd
+
+# Os frames em cache (linhas brutas e rollup diário) são mantidos ordenados por
+# 'ds_normalized', então os filtros de data e ano viram fatias por busca binária
+# (searchsorted) em vez de máscaras booleanas do tamanho do frame.
+
+
+def date_slice_bounds(dates, start_date, end_date):
+    values = dates.to_numpy()
+    start = pd.Timestamp(start_date).normalize().to_datetime64()
+    # Fim inclusivo: tudo antes do dia seguinte a end_date
+    end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+    return int(values.searchsorted(start, side='left')), int(values.searchsorted(end, side='left'))
+
+
+def _year_slices(dates, selected_years):
+    values = dates.to_numpy()
+    slices = []
+    for year in sorted(set(int(y) for y in selected_years)):
+        lo = values.searchsorted(pd.Timestamp(year=year, month=1, day=1).to_datetime64(), side='left')
+        hi = values.searchsorted(pd.Timestamp(year=year + 1, month=1, day=1).to_datetime64(), side='left')
+        if lo < hi:
+            # Anos consecutivos formam uma única fatia contígua
+            if slices and slices[-1][1] == lo:
+                slices[-1] = (slices[-1][0], hi)
+            else:
+                slices.append((lo, hi))
+    return slices
+
+
+def apply_filters(data, selected_dates, selected_years):
+    # Aplicar o filtro de Data (date_input devolve uma tupla; com 1 elemento durante a seleção)
+    if isinstance(selected_dates, (list, tuple)) and len(selected_dates) == 2:
+        lo, hi = date_slice_bounds(data['ds_normalized'], *selected_dates)
+        data = data.iloc[lo:hi]
+
+    # Aplicar o filtro de Ano (pela própria data: o frame de linhas não guarda a coluna 'year')
+    if selected_years and not data.empty:
+        slices = _year_slices(data['ds_normalized'], selected_years)
+        if slices == [(0, len(data))]:
+            return data
+        if len(slices) == 1:
+            return data.iloc[slices[0][0]:slices[0][1]]
+        if not slices:
+            return data.iloc[0:0]
+        return pd.concat([data.iloc[lo:hi] for lo, hi in slices])
+
+    return data
+
+
+def project_categories(available_categories, selected_categories):
+    # A seleção de categorias é uma projeção de colunas: gráficos e painéis
+    # leem apenas as categorias selecionadas (todas, se nenhuma for escolhida)
+    selected = [col for col in available_categories if col in selected_categories]
+    return selected or list(available_categories)
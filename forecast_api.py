@@ -0,0 +1,180 @@
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+from aggregations import build_daily_rollup
+from filters import apply_filters, project_categories
+from forecast_catalog import parse_forecast_name
+from forecast_data import CATEGORY_COLUMNS, load_forecast
+
+# Uso sem interface: as mesmas métricas dos painéis do dashboard, para alertas,
+# planejamento de escala e jobs noturnos. Ex.:
+#   python forecast_api.py "forecast_Fevereiro(Previsoes).csv" --start 2025-02-01 --end 2025-02-14
+#   python forecast_api.py arquivo.csv --batch consultas.json --format parquet --output saida.parquet
+
+
+def panel_metrics(daily, categories):
+    # Métricas dos painéis do Home.py a partir do rollup diário já filtrado
+    total_cases = float(daily['total'].sum()) if len(daily) else 0.0
+    total_days = len(daily)
+    return {
+        'category_totals': {
+            cat: float(daily[cat].sum()) if cat in categories and len(daily) else 0.0
+            for cat in CATEGORY_COLUMNS
+        },
+        'total_cases': total_cases,
+        'days': total_days,
+        'average_cases_per_day': total_cases / total_days if total_days else 0.0,
+    }
+
+
+def daily_sums(daily, categories):
+    # Soma diária das categorias selecionadas (a série dos gráficos de barras)
+    return [
+        {'ds': day.date().isoformat(), 'cases': float(cases)}
+        for day, cases in zip(daily['ds_normalized'], daily[categories].sum(axis=1))
+    ]
+
+
+def check_categories(categories):
+    # Sem esta checagem uma categoria desconhecida não casa com nada e
+    # project_categories volta para todas as categorias (totais errados, sem erro)
+    unknown = [cat for cat in categories or [] if cat not in CATEGORY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Categorias desconhecidas: {', '.join(map(str, unknown))} "
+                         f"(válidas: {', '.join(CATEGORY_COLUMNS)})")
+
+
+QUERY_KEYS = ('start', 'end', 'categories', 'years', 'daily')
+
+
+def check_query(query):
+    # Consulta do --batch: sem esta checagem, um objeto no lugar da lista, uma chave
+    # desconhecida ou uma data inválida só falhariam depois de carregar o arquivo,
+    # com um traceback (AttributeError, TypeError ou erro do pandas)
+    if not isinstance(query, dict):
+        raise ValueError(f"Esperado um objeto JSON, recebido {type(query).__name__}")
+    unknown = [key for key in query if key not in QUERY_KEYS]
+    if unknown:
+        raise ValueError(f"Chaves desconhecidas: {', '.join(unknown)} (válidas: {', '.join(QUERY_KEYS)})")
+    for key in ('start', 'end'):
+        value = query.get(key)
+        if value is None:
+            continue
+        try:
+            valid = isinstance(value, str) and pd.notna(pd.Timestamp(value))
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(f"Data inválida em '{key}': {value!r} (use AAAA-MM-DD)")
+    for key in ('categories', 'years'):
+        if query.get(key) is not None and not isinstance(query[key], list):
+            raise ValueError(f"'{key}' deve ser uma lista")
+    if any(not isinstance(year, int) or isinstance(year, bool) for year in query.get('years') or []):
+        raise ValueError("'years' deve conter apenas anos inteiros")
+    check_categories(query.get('categories'))
+
+
+class ForecastDataset:
+    # Um arquivo de previsão carregado uma única vez (com o snapshot Arrow, quando
+    # houver); cada consulta apenas fatia o rollup diário, sem reler o CSV
+
+    def __init__(self, csv_file_path, month=None, snapshot_dir=None):
+        self.path = csv_file_path
+        self.month = month if month is not None else parse_forecast_name(csv_file_path)[0]
+        self.data = load_forecast(csv_file_path, snapshot_dir=snapshot_dir, month=self.month)
+        self.daily = build_daily_rollup(self.data)
+
+    def query(self, start=None, end=None, categories=None, years=None, daily=False):
+        check_categories(categories)
+        days = self.daily['ds_normalized']
+        selected_dates = ()
+        if len(days):
+            selected_dates = (start or days.iloc[0].date(), end or days.iloc[-1].date())
+        filtered = apply_filters(self.daily, selected_dates, years or [])
+        active_categories = project_categories(CATEGORY_COLUMNS, categories or [])
+        result = {
+            'start': str(selected_dates[0]) if selected_dates else None,
+            'end': str(selected_dates[1]) if selected_dates else None,
+            'categories': active_categories,
+            'years': list(years or []),
+        }
+        result.update(panel_metrics(filtered, active_categories))
+        if daily:
+            result['daily'] = daily_sums(filtered, active_categories)
+        return result
+
+    def run_batch(self, queries):
+        return [self.query(**query) for query in queries]
+
+
+def results_frame(results):
+    # Uma linha por consulta, com uma coluna por categoria (formato do Parquet)
+    rows = []
+    for i, result in enumerate(results):
+        row = {
+            'query': i,
+            'start': result['start'],
+            'end': result['end'],
+            'categories': ",".join(result['categories']),
+            'years': ",".join(str(year) for year in result['years']),
+            'total_cases': result['total_cases'],
+            'days': result['days'],
+            'average_cases_per_day': result['average_cases_per_day'],
+        }
+        row.update(result['category_totals'])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Métricas do dashboard de previsão sem a interface.")
+    parser.add_argument("csv_file", help="Arquivo de previsão (forecast_<Mês>...csv).")
+    parser.add_argument("--month", type=int, help="Mês da previsão (padrão: extraído do nome do arquivo).")
+    parser.add_argument("--start", help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument("--end", help="Data final, inclusiva (AAAA-MM-DD).")
+    parser.add_argument("--categories", nargs="+", choices=CATEGORY_COLUMNS, help="Categorias (padrão: todas).")
+    parser.add_argument("--years", nargs="+", type=int, help="Anos (padrão: todos).")
+    parser.add_argument("--daily", action="store_true", help="Inclui a soma diária no JSON.")
+    parser.add_argument("--batch", help="JSON com uma lista de consultas ({start, end, categories, years, daily}).")
+    parser.add_argument("--format", choices=["json", "parquet"], default="json")
+    parser.add_argument("--output", help="Arquivo de saída (padrão: JSON na saída padrão).")
+    args = parser.parse_args(argv)
+
+    if args.format == "parquet" and not args.output:
+        parser.error("--format parquet exige --output")
+
+    if args.batch:
+        with open(args.batch, encoding="utf-8") as f:
+            queries = json.load(f)
+    else:
+        queries = [dict(start=args.start, end=args.end, categories=args.categories,
+                        years=args.years, daily=args.daily)]
+
+    # Valida todas as consultas antes de carregar o arquivo
+    if not isinstance(queries, list):
+        parser.error(f"--batch deve conter uma lista de consultas, recebido {type(queries).__name__}")
+    for i, query in enumerate(queries):
+        try:
+            check_query(query)
+        except ValueError as e:
+            parser.error(f"consulta {i}: {e}")
+
+    dataset = ForecastDataset(args.csv_file, month=args.month)
+    results = dataset.run_batch(queries)
+
+    if args.format == "parquet":
+        results_frame(results).to_parquet(args.output, index=False)
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import glob
+import os
+import re
+import unicodedata
+from collections import namedtuple
+
+# Arquivos de previsão mensais: forecast_<Mês>[<Ano>](...).csv, ex.: forecast_Fevereiro(Previsoes).csv
+FORECAST_PATTERN = "forecast_*.csv"
+
+MONTH_NAMES = [
+    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"
+]
+
+ForecastFile = namedtuple("ForecastFile", ["label", "path", "month", "year"])
+
+
+def _strip_accents(text):
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+
+
+_MONTH_BY_NAME = {_strip_accents(name): i + 1 for i, name in enumerate(MONTH_NAMES)}
+
+
+def parse_forecast_name(filename):
+    # Extrai mês (nome em português) e ano opcional do nome do arquivo
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    month = None
+    for word in re.findall(r"[^\W\d_]+", stem):
+        month = _MONTH_BY_NAME.get(_strip_accents(word))
+        if month:
+            break
+    year_match = re.search(r"(?<!\d)(20\d{2})(?!\d)", stem)
+    year = int(year_match.group(1)) if year_match else None
+    return month, year
+
+
+def discover_forecasts(directory):
+    # Apenas descobre os arquivos; a leitura acontece sob demanda no primeiro acesso
+    entries = []
+    for path in glob.glob(os.path.join(directory, FORECAST_PATTERN)):
+        month, year = parse_forecast_name(path)
+        if month is None:
+            label = os.path.splitext(os.path.basename(path))[0]
+        else:
+            label = MONTH_NAMES[month - 1] + (f" {year}" if year else "")
+        entries.append(ForecastFile(label, path, month, year))
+    entries.sort(key=lambda entry: (entry.year or 0, entry.month or 0, entry.label))
+    return entries
@@ -0,0 +1,387 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow é opcional: sem ele o snapshot é ignorado e o CSV é lido pelo engine C
+    feather = None
+
+# Incrementar sempre que o pré-processamento mudar, para invalidar snapshots antigos
+SNAPSHOT_VERSION = 6
+SNAPSHOT_DIR_NAME = ".snapshots"
+
+# Renomeação das colunas para remover acentos e espaços indesejados
+COLUMN_RENAMES = {
+    "y": "total",
+    "cat_informação": "cat_informacao",
+    "cat_reclamação": "cat_reclamacao",  # renomeia com acento para sem acento
+    "cat_pré-venda": "cat_pre_venda",
+    "cat_solicitação": "cat_solicitacao",
+    # Canais com acento
+    "britânia": "britania",
+    "não_informado": "nao_informado",
+    "casa_e_vídeo": "casa_e_video"
+}
+
+# Lista de colunas que precisamos converter e somar
+CATEGORY_COLUMNS = [
+    "cat_cancelamento",
+    "cat_informacao",
+    "cat_reclamacao",
+    "cat_troca",
+    "cat_preventiva",
+    "cat_pre_venda",
+    "cat_solicitacao"
+]
+
+
+# Colunas que não são canais de venda (todas as demais são canais: magazine_luiza, shopee, ...)
+NON_CHANNEL_COLUMNS = {"ds", "y", "total", "semana", "ds_normalized", "year", "month", "count"}
+
+
+def is_channel_column(col):
+    return col not in NON_CHANNEL_COLUMNS and not col.startswith("cat_")
+
+
+def channel_columns(columns):
+    return [col for col in columns if is_channel_column(col)]
+
+
+# Colunas efetivamente usadas pelo dashboard no modo streaming (nomes originais do CSV)
+DASHBOARD_SOURCE_COLUMNS = {"ds", "y"} | {
+    raw for raw, name in COLUMN_RENAMES.items() if name in CATEGORY_COLUMNS
+} | set(CATEGORY_COLUMNS)
+
+
+def _is_dashboard_source_column(col):
+    return col in DASHBOARD_SOURCE_COLUMNS or is_channel_column(col)
+
+
+# Formato do CSV de previsão: latin1, ';' como separador e vírgula decimal ("2437,578857")
+SOURCE_ENCODING = "latin1"
+SOURCE_SEPARATOR = ";"
+SOURCE_DECIMAL = ","
+# Todas as colunas de valores (y, categorias, semana e canais) são lidas direto em float32
+VALUE_DTYPE = "float32"
+
+
+def source_columns(source):
+    # Lê só a linha de cabeçalho (caminho ou buffer binário), sem consumir o buffer
+    if hasattr(source, 'readline'):
+        position = source.tell()
+        header = source.readline()
+        source.seek(position)
+    else:
+        with open(source, 'rb') as f:
+            header = f.readline()
+    return header.decode(SOURCE_ENCODING).strip().split(SOURCE_SEPARATOR)
+
+
+def source_dtypes(columns):
+    # Esquema tipado da leitura: ds é data, o restante é numérico
+    return {col: VALUE_DTYPE for col in columns if col != "ds"}
+
+
+def _read_source(source, **kwargs):
+    # Com pyarrow a leitura é multithread e converte a vírgula decimal nativamente;
+    # o engine C (ou o modo em blocos, que o pyarrow não suporta) usa o mesmo esquema
+    engine = "pyarrow" if feather is not None and 'chunksize' not in kwargs else "c"
+    return pd.read_csv(
+        source, encoding=SOURCE_ENCODING, sep=SOURCE_SEPARATOR, decimal=SOURCE_DECIMAL,
+        dtype=source_dtypes(source_columns(source)), parse_dates=["ds"], engine=engine,
+        **kwargs,
+    )
+
+# Acima deste tamanho o CSV é lido em blocos, para manter o pico de memória limitado
+STREAMING_MIN_BYTES = 64 * 1024 * 1024
+DEFAULT_CHUNKSIZE = 200_000
+
+
+# -------------------- Reconciliação das categorias --------------------
+
+# Cada linha deve somar o total: as categorias são reescaladas proporcionalmente
+# e o relatório registra quantas linhas foram ajustadas e o maior desvio relativo
+# (|fator - 1|) aplicado a cada categoria
+
+
+def empty_reconciliation():
+    return {'rows': 0, 'rows_adjusted': 0, 'max_drift': {col: 0.0 for col in CATEGORY_COLUMNS}}
+
+
+def merge_reconciliation(report, other):
+    return {
+        'rows': report['rows'] + other['rows'],
+        'rows_adjusted': report['rows_adjusted'] + other['rows_adjusted'],
+        'max_drift': {col: max(report['max_drift'].get(col, 0.0), other['max_drift'].get(col, 0.0))
+                      for col in CATEGORY_COLUMNS},
+    }
+
+
+def reconcile_categories(values, total):
+    # values: matriz (linhas x categorias) contígua, reescalada no próprio lugar.
+    # Devolve a soma original de cada linha e o relatório de reconciliação.
+    sums = values.sum(axis=1)
+    adjust = (sums > 0) & ~np.isclose(sums, total)
+    factor = np.ones(len(sums), dtype=values.dtype)
+    np.divide(total, sums, out=factor, where=adjust)
+
+    drift = np.abs(factor - 1)
+    report = empty_reconciliation()
+    report['rows'] = len(sums)
+    report['rows_adjusted'] = int(adjust.sum())
+    if report['rows_adjusted']:
+        for j, col in enumerate(CATEGORY_COLUMNS):
+            touched = values[:, j] != 0
+            report['max_drift'][col] = float(drift[touched].max()) if touched.any() else 0.0
+
+    values *= factor[:, None]
+    return sums, report
+
+
+def _transform_forecast(df, month=None):
+    df.rename(columns=COLUMN_RENAMES, inplace=True)
+
+    # Conversão de datas (o engine pyarrow devolve segundos; padroniza em nanossegundos)
+    df['ds'] = pd.to_datetime(df['ds'], errors='coerce').astype('datetime64[ns]')
+    df['ds_normalized'] = df['ds'].dt.normalize()
+    # Ano e mês não ficam no frame: são derivados de ds_normalized sob demanda
+    # (o rollup diário os mantém em int16, ver aggregations.py)
+
+    # Seleciona apenas o mês da previsão (o arquivo traz também dias do mês anterior)
+    if month is not None:
+        # (cópia explícita: as colunas são atribuídas logo abaixo)
+        df = df.loc[df['ds'].dt.month == month].copy()
+
+    # As colunas já chegam tipadas da leitura; células vazias viram zero e
+    # categorias ausentes no arquivo são criadas zeradas
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.zeros(len(df), dtype=VALUE_DTYPE)
+    value_columns = CATEGORY_COLUMNS + ['total'] + channel_columns(df.columns)
+    df[value_columns] = df[value_columns].fillna(0)
+
+    # Ajuste: Reescala as categorias para que a soma por linha seja igual ao total
+    # (uma cópia contígua das categorias, reescalada no lugar e devolvida ao frame)
+    values = np.ascontiguousarray(df[CATEGORY_COLUMNS].to_numpy(dtype=VALUE_DTYPE))
+    sums, report = reconcile_categories(values, df['total'].to_numpy(dtype=VALUE_DTYPE))
+    df[CATEGORY_COLUMNS] = values
+    df['count'] = sums
+
+    return df, report
+
+
+def read_actuals(csv_file_path):
+    # Realizado no mesmo layout do arquivo de previsão (ds, y, categorias e canais),
+    # lido com o mesmo esquema tipado; sem filtro de mês e sem reescala
+    df = _read_source(csv_file_path)
+    df.rename(columns=COLUMN_RENAMES, inplace=True)
+    df['ds'] = pd.to_datetime(df['ds'], errors='coerce').astype('datetime64[ns]')
+    df['ds_normalized'] = df['ds'].dt.normalize()
+    value_columns = [col for col in df.columns if col not in ('ds', 'ds_normalized', 'semana')]
+    df[value_columns] = df[value_columns].fillna(0)
+    return _sort_by_date(df)
+
+
+def _sort_by_date(df):
+    # Frame ordenado por data: os filtros de data/ano usam busca binária (ver filters.py)
+    return df.sort_values('ds_normalized', kind='stable', ignore_index=True)
+
+
+def preprocess_forecast(csv_file_path, chunksize=None, month=None):
+    return _preprocess(csv_file_path, chunksize=chunksize, month=month)[0]
+
+
+def _preprocess(csv_file_path, chunksize=None, month=None):
+    # Devolve (df, relatório de reconciliação)
+    if chunksize is None:
+        df, report = _transform_forecast(_read_source(csv_file_path), month)
+        return _sort_by_date(df), report
+
+    # Modo streaming: mantém em memória apenas o resultado já filtrado
+    chunks = []
+    report = empty_reconciliation()
+    for chunk, chunk_report in iter_forecast_chunks(csv_file_path, chunksize, month):
+        chunks.append(chunk)
+        report = merge_reconciliation(report, chunk_report)
+    chunks = [chunk for chunk in chunks if not chunk.empty] or chunks[:1]
+    return _sort_by_date(pd.concat(chunks, ignore_index=True)), report
+
+
+def iter_forecast_chunks(csv_file_path, chunksize=DEFAULT_CHUNKSIZE, month=None, usecols=_is_dashboard_source_column):
+    # Filtra e reescala bloco a bloco: (bloco, relatório). Por padrão lê só as
+    # colunas usadas pelo dashboard (usecols=None lê todas)
+    reader = _read_source(csv_file_path, usecols=usecols, chunksize=chunksize)
+    for chunk in reader:
+        yield _transform_forecast(chunk, month)
+
+# -------------------- Snapshot colunar (Arrow IPC) --------------------
+
+
+def _source_signature(csv_file_path, stat, previous=None, block_size=1 << 20):
+    # sha256 do arquivo. Se a versão anterior (previous) for um prefixo intacto do
+    # arquivo atual, devolve também o offset a partir do qual há linhas novas.
+    digest = hashlib.sha256()
+    append_offset = None
+    with open(csv_file_path, 'rb') as f:
+        if previous is not None and 0 < previous.get('size', 0) < stat.st_size:
+            remaining = previous['size']
+            last_block = b''
+            while remaining:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+                last_block = block
+            # Só é acréscimo se o conteúdo antigo não mudou e terminava em quebra de linha
+            if digest.hexdigest() == previous.get('sha256') and last_block.endswith(b'\n'):
+                append_offset = previous['size']
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    signature = {
+        'sha256': digest.hexdigest(),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+    return signature, append_offset
+
+
+def source_signature(csv_file_path):
+    # sha256, mtime e tamanho do arquivo (sem a detecção de linhas acrescentadas)
+    return _source_signature(csv_file_path, os.stat(csv_file_path))[0]
+
+
+def read_appended_rows(csv_file_path, offset, chunksize=None, month=None):
+    # Lê apenas o final do arquivo (a partir de offset), reaproveitando o cabeçalho.
+    # Devolve (df, relatório de reconciliação) das linhas novas.
+    with open(csv_file_path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    return _preprocess(io.BytesIO(header + tail), chunksize=chunksize, month=month)
+
+
+def _snapshot_paths(csv_file_path, snapshot_dir):
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    base = os.path.join(snapshot_dir, stem)
+    return base + ".arrow", base + ".json"
+
+
+def _read_snapshot_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _replace_atomically(path, write):
+    # Cada escritor grava em um temporário próprio (o worker, as sessões e a CLI podem
+    # gravar o mesmo snapshot ao mesmo tempo) e só então substitui o arquivo final
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_snapshot_meta(meta_path, meta):
+    _replace_atomically(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+
+def _write_snapshot(df, data_path, meta_path, meta):
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    # Sem compressão para permitir leitura memory-mapped (zero-copy)
+    _replace_atomically(data_path, lambda f: feather.write_feather(df, f, compression='uncompressed'))
+    _write_snapshot_meta(meta_path, meta)
+
+
+def _same_settings(source, settings):
+    return all(source.get(key) == value for key, value in settings.items())
+
+
+def refresh_forecast(csv_file_path, previous=None, snapshot_dir=None, chunksize=None, month=None):
+    # Devolve (df, tail, source). previous = (df, source) já em memória, se houver.
+    # tail são só as linhas novas acrescentadas desde previous (vazio se nada mudou);
+    # tail None significa que o frame foi recarregado por completo.
+    stat = os.stat(csv_file_path)
+    if chunksize is None and stat.st_size >= STREAMING_MIN_BYTES:
+        chunksize = DEFAULT_CHUNKSIZE
+    # O modo streaming materializa menos colunas, então entra na validação do snapshot
+    streaming = chunksize is not None
+    settings = {'version': SNAPSHOT_VERSION, 'streaming': streaming, 'month': month}
+
+    if feather is not None:
+        if snapshot_dir is None:
+            snapshot_dir = os.path.join(os.path.dirname(os.path.abspath(csv_file_path)), SNAPSHOT_DIR_NAME)
+        data_path, meta_path = _snapshot_paths(csv_file_path, snapshot_dir)
+
+    # Versão de partida: a que já está em memória ou, na partida a frio, o snapshot em disco
+    base_df, base_source = previous if previous is not None else (None, None)
+    if base_df is not None and not _same_settings(base_source, settings):
+        # Mudou o modo de leitura (ex.: o arquivo passou do limite do streaming): recarga completa
+        base_df, base_source, previous = None, None, None
+    if base_df is None and feather is not None:
+        meta = _read_snapshot_meta(meta_path)
+        if meta is not None and _same_settings(meta, settings) and os.path.exists(data_path):
+            try:
+                base_df, base_source = feather.read_feather(data_path, memory_map=True), meta
+            except (OSError, ValueError):
+                # Snapshot ilegível (truncado ou corrompido): trata como ausente e reprocessa o CSV
+                base_df, base_source = None, None
+
+    empty_tail = base_df.iloc[0:0] if previous is not None else None
+
+    # Caminho rápido: mesmo mtime e tamanho, não precisa recalcular o hash
+    if base_df is not None and base_source.get('mtime_ns') == stat.st_mtime_ns and base_source.get('size') == stat.st_size:
+        return base_df, empty_tail, base_source
+
+    signature, append_offset = _source_signature(csv_file_path, stat, base_source if base_df is not None else None)
+    source = dict(settings, **signature)
+
+    if base_df is not None and base_source.get('sha256') == source['sha256']:
+        # Arquivo apenas "tocado" (mtime mudou, conteúdo igual): reaproveita o snapshot
+        df, tail = base_df, empty_tail
+        source['reconciliation'] = base_source.get('reconciliation')
+        if feather is not None:
+            try:
+                _write_snapshot_meta(meta_path, source)
+            except OSError:
+                pass
+        return df, tail, source
+
+    if append_offset is not None:
+        # Linhas acrescentadas ao final: processa só o trecho novo e junta ao frame existente
+        appended, report = read_appended_rows(csv_file_path, append_offset, chunksize=chunksize, month=month)
+        df = _sort_by_date(pd.concat([base_df, appended], ignore_index=True))
+        tail = appended if previous is not None else None
+        report = merge_reconciliation(base_source.get('reconciliation') or empty_reconciliation(), report)
+    else:
+        df, report = _preprocess(csv_file_path, chunksize=chunksize, month=month)
+        tail = None
+    # O relatório fica junto da assinatura (em memória e no metadado do snapshot)
+    source['reconciliation'] = report
+
+    if feather is not None:
+        try:
+            _write_snapshot(df, data_path, meta_path, source)
+        except OSError:
+            # Diretório somente leitura: segue sem snapshot
+            pass
+    return df, tail, source
+
+
+def load_forecast(csv_file_path, snapshot_dir=None, chunksize=None, month=None):
+    return refresh_forecast(csv_file_path, snapshot_dir=snapshot_dir, chunksize=chunksize, month=month)[0]
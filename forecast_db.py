@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional: sem ele o backend SQL usa o SQLite da biblioteca padrão
+    duckdb = None
+
+from aggregations import DATE_PART_DTYPE, ChannelMatrix
+from forecast_data import (
+    CATEGORY_COLUMNS,
+    SNAPSHOT_DIR_NAME,
+    SNAPSHOT_VERSION,
+    VALUE_DTYPE,
+    channel_columns,
+    empty_reconciliation,
+    iter_forecast_chunks,
+    merge_reconciliation,
+    source_signature,
+)
+
+# Backend SQL local: as linhas de cada previsão são gravadas em um banco analítico
+# embutido (um arquivo) e os agregados saem de consultas GROUP BY; só os resultados
+# (uma linha por dia) e as linhas filtradas da exportação voltam para o Python.
+# A memória não cresce com o histórico: a ingestão é feita em blocos.
+SQL_BACKENDS = ('duckdb', 'sqlite')
+DATABASE_FILES = {'duckdb': "forecast.duckdb", 'sqlite': "forecast.sqlite"}
+
+# Cada linha guarda o dia como inteiro (dias desde 1970-01-01): os filtros de data e
+# ano viram intervalos de inteiros no WHERE, iguais nos dois bancos
+DAY_COLUMN = 'day'
+_EPOCH_DAY = np.datetime64(0, 'D')
+
+_META_TABLE = 'forecast_sources'
+
+# Linhas lidas do CSV por bloco na ingestão. Menor que o bloco do modo streaming em
+# memória: o pico da leitura cresce com o bloco, e aqui o resultado vai para o banco
+INGEST_CHUNKSIZE = 50_000
+
+
+def default_sql_backend():
+    return 'duckdb' if duckdb is not None else 'sqlite'
+
+
+def default_database_path(directory, backend):
+    return os.path.join(directory, SNAPSHOT_DIR_NAME, DATABASE_FILES[backend])
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_name(csv_file_path):
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    return "rows_" + re.sub(r"\W", "_", stem, flags=re.ASCII)
+
+
+def _to_days(dates):
+    return (np.asarray(dates, dtype='datetime64[D]') - _EPOCH_DAY).astype(np.int64)
+
+
+def _from_days(days):
+    return (_EPOCH_DAY + np.asarray(days, dtype=np.int64)).astype('datetime64[ns]')
+
+
+def day_ranges(selected_dates, selected_years):
+    # Mesmos filtros de filters.apply_filters, como intervalos [início, fim) de dias
+    ranges = [(None, None)]
+    if isinstance(selected_dates, (list, tuple)) and len(selected_dates) == 2:
+        start, end = _to_days([pd.Timestamp(day).normalize() for day in selected_dates])
+        ranges = [(int(start), int(end) + 1)]
+    if selected_years:
+        years = sorted(set(int(y) for y in selected_years))
+        year_ranges = []
+        for year in years:
+            lo, hi = _to_days([np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01")])
+            if year_ranges and year_ranges[-1][1] == lo:
+                year_ranges[-1] = (year_ranges[-1][0], int(hi))
+            else:
+                year_ranges.append((int(lo), int(hi)))
+        start, end = ranges[0]
+        ranges = [
+            (lo if start is None else max(lo, start), hi if end is None else min(hi, end))
+            for lo, hi in year_ranges
+        ]
+        ranges = [(lo, hi) for lo, hi in ranges if lo < hi]
+    return ranges
+
+
+def _where(ranges):
+    # Cláusula WHERE com parâmetros posicionais (?) para os intervalos de dias
+    if ranges == [(None, None)]:
+        return "", []
+    if not ranges:
+        return " WHERE FALSE", []
+    clauses, params = [], []
+    for lo, hi in ranges:
+        parts = []
+        if lo is not None:
+            parts.append(f"{DAY_COLUMN} >= ?")
+            params.append(lo)
+        if hi is not None:
+            parts.append(f"{DAY_COLUMN} < ?")
+            params.append(hi)
+        clauses.append("(" + " AND ".join(parts) + ")")
+    return " WHERE " + " OR ".join(clauses), params
+
+
+class ForecastDatabase:
+    # Um arquivo de banco por processo, com uma tabela de linhas por arquivo de
+    # previsão e uma tabela de metadados (assinatura, canais e reconciliação).
+    # As consultas são serializadas por um lock: a conexão é compartilhada entre
+    # as sessões e o worker de pré-cálculo. A ingestão usa uma conexão própria e
+    # grava em uma tabela provisória, então as consultas não esperam por ela; só a
+    # troca da tabela provisória pela definitiva acontece sob o lock.
+
+    def __init__(self, path, backend=None):
+        self.backend = backend or default_sql_backend()
+        if self.backend not in SQL_BACKENDS:
+            raise ValueError(f"Backend SQL desconhecido: {self.backend}")
+        if self.backend == 'duckdb' and duckdb is None:
+            raise ImportError("O backend duckdb exige o pacote duckdb instalado")
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.backend == 'duckdb':
+            self._con = duckdb.connect(path)
+        else:
+            self._con = sqlite3.connect(path, check_same_thread=False)
+            # WAL: leituras na conexão principal continuam durante a gravação da ingestão
+            self._con.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        # Uma ingestão por vez (o worker e uma sessão podem pedir o mesmo arquivo)
+        self._ingest_lock = threading.Lock()
+        with self._lock:
+            self._execute(
+                f"CREATE TABLE IF NOT EXISTS {_META_TABLE} ("
+                "name TEXT PRIMARY KEY, meta TEXT NOT NULL)")
+            self._commit()
+
+    def _execute(self, sql, params=()):
+        return self._con.execute(sql, list(params))
+
+    def _commit(self):
+        if self.backend == 'sqlite':
+            self._con.commit()
+
+    def _query_frame(self, sql, params=()):
+        if self.backend == 'duckdb':
+            return self._con.execute(sql, list(params)).df()
+        return pd.read_sql_query(sql, self._con, params=list(params))
+
+    def _ingest_connection(self):
+        if self.backend == 'duckdb':
+            return self._con.cursor()
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def _insert_frame(self, con, table, df, create):
+        if self.backend == 'duckdb':
+            con.register('chunk', df)
+            try:
+                if create:
+                    con.execute(f"CREATE TABLE {_quote(table)} AS SELECT * FROM chunk")
+                else:
+                    con.execute(f"INSERT INTO {_quote(table)} SELECT * FROM chunk")
+            finally:
+                con.unregister('chunk')
+        else:
+            df.to_sql(table, con, if_exists='replace' if create else 'append', index=False)
+            con.commit()
+
+    # -------------------- Ingestão --------------------
+
+    def _read_meta(self, table):
+        row = self._execute(f"SELECT meta FROM {_META_TABLE} WHERE name = ?", [table]).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write_meta(self, table, meta):
+        self._execute(f"DELETE FROM {_META_TABLE} WHERE name = ?", [table])
+        self._execute(f"INSERT INTO {_META_TABLE} VALUES (?, ?)", [table, json.dumps(meta)])
+
+    def _ingest(self, staging, csv_file_path, month, chunksize):
+        # Lê o CSV em blocos (mesma leitura e reescala do modo streaming, com todas as
+        # colunas) e grava cada bloco na tabela provisória: o pico de memória é o de um bloco
+        report = empty_reconciliation()
+        columns = None
+        con = self._ingest_connection()
+        try:
+            con.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+            for chunk, chunk_report in iter_forecast_chunks(csv_file_path, chunksize, month, usecols=None):
+                report = merge_reconciliation(report, chunk_report)
+                chunk = chunk[chunk['ds_normalized'].notna()]
+                rows = chunk.drop(columns=['ds_normalized'])
+                rows.insert(0, DAY_COLUMN, _to_days(chunk['ds_normalized']))
+                if columns is None:
+                    columns = list(rows.columns)
+                    self._insert_frame(con, staging, rows, create=True)
+                elif not rows.empty:
+                    self._insert_frame(con, staging, rows[columns], create=False)
+        finally:
+            con.close()
+        return columns or [], report
+
+    def _current_meta(self, table, settings):
+        with self._lock:
+            meta = self._read_meta(table)
+        if meta is not None and any(meta.get(key) != value for key, value in settings.items()):
+            return None
+        return meta
+
+    def refresh(self, csv_file_path, month=None, chunksize=INGEST_CHUNKSIZE):
+        # Devolve (tabela, source, changed): a tabela só é regravada quando o conteúdo
+        # do arquivo muda (mtime/tamanho iguais dispensam o hash, como no snapshot)
+        table = _table_name(csv_file_path)
+        stat = os.stat(csv_file_path)
+        settings = {'version': SNAPSHOT_VERSION, 'month': month}
+        meta = self._current_meta(table, settings)
+        if meta is not None and meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return ForecastTable(self, table, meta), meta, False
+
+        with self._ingest_lock:
+            # Outra thread pode ter acabado de ingerir o mesmo arquivo
+            meta = self._current_meta(table, settings)
+            signature = source_signature(csv_file_path)
+            changed = meta is None or meta['sha256'] != signature['sha256']
+            if changed:
+                staging = table + "__staging"
+                columns, report = self._ingest(staging, csv_file_path, month, chunksize)
+                meta = dict(settings, columns=columns, reconciliation=report)
+            meta.update(signature)
+            with self._lock:
+                if changed:
+                    self._execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                    self._execute(f"ALTER TABLE {_quote(staging)} RENAME TO {_quote(table)}")
+                self._write_meta(table, meta)
+                self._commit()
+        return ForecastTable(self, table, meta), meta, changed
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._query_frame(sql, params)
+
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+
+class ForecastTable:
+    # Linhas de um arquivo de previsão no banco. Os agregados do dashboard são
+    # consultas GROUP BY por dia; os filtros de data e ano da exportação viram WHERE.
+
+    def __init__(self, database, table, meta):
+        self.database = database
+        self.table = table
+        self.columns = meta['columns']
+        self.channels = channel_columns([col for col in self.columns if col != DAY_COLUMN])
+
+    def _sums(self, columns):
+        sums = ", ".join(f"SUM({_quote(col)}) AS {_quote(col)}" for col in columns)
+        sql = (f"SELECT {DAY_COLUMN}{', ' + sums if sums else ''}, COUNT(*) AS \"rows\" "
+               f"FROM {_quote(self.table)} GROUP BY {DAY_COLUMN} ORDER BY {DAY_COLUMN}")
+        return self.database.query(sql)
+
+    def daily_rollup(self):
+        # Mesmo layout de aggregations.build_daily_rollup, calculado pelo banco. Fica
+        # inteiro em memória (uma linha por dia): os filtros de data e ano do dashboard
+        # são fatias dele; no banco, só as linhas brutas da exportação são filtradas
+        value_cols = [col for col in CATEGORY_COLUMNS + ['total', 'count'] if col in self.columns]
+        sums = self._sums(value_cols)
+        rollup = pd.DataFrame({'ds_normalized': _from_days(sums[DAY_COLUMN])})
+        for col in value_cols:
+            rollup[col] = sums[col].to_numpy(dtype=VALUE_DTYPE)
+        rollup['rows'] = sums['rows'].to_numpy(dtype=np.int64)
+        rollup['year'] = rollup['ds_normalized'].dt.year.astype(DATE_PART_DTYPE)
+        rollup['month'] = rollup['ds_normalized'].dt.month.astype(DATE_PART_DTYPE)
+        return rollup
+
+    def channel_matrix(self):
+        sums = self._sums(self.channels)
+        values = sums[self.channels].to_numpy(dtype=np.float64) if self.channels else np.zeros((len(sums), 0))
+        return ChannelMatrix(_from_days(sums[DAY_COLUMN]), self.channels, values)
+
+    def count(self, selected_dates=(), selected_years=()):
+        where, params = _where(day_ranges(selected_dates, selected_years))
+        return int(self.database.query(
+            f"SELECT COUNT(*) AS n FROM {_quote(self.table)}{where}", params)['n'].iloc[0])
+
+    def rows(self, selected_dates=(), selected_years=()):
+        # Linhas brutas filtradas (exportação), no layout do frame do modo pandas
+        where, params = _where(day_ranges(selected_dates, selected_years))
+        columns = [col for col in self.columns if col != DAY_COLUMN]
+        df = self.database.query(
+            f"SELECT {DAY_COLUMN}, {', '.join(_quote(col) for col in columns)} "
+            f"FROM {_quote(self.table)}{where} ORDER BY {DAY_COLUMN}, ds", params)
+        df['ds'] = pd.to_datetime(df['ds']).astype('datetime64[ns]')
+        df['ds_normalized'] = _from_days(df.pop(DAY_COLUMN))
+        value_cols = [col for col in columns if col != 'ds']
+        df[value_cols] = df[value_cols].astype(VALUE_DTYPE)
+        return df
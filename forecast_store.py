@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from aggregations import (
+    build_channel_matrix,
+    build_cumulative_rollup,
+    build_daily_rollup,
+    build_year_cube,
+    merge_daily_rollup,
+)
+from forecast_catalog import discover_forecasts
+from forecast_data import refresh_forecast
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (em segundos) entre as varreduras do diretório pelo worker de pré-cálculo
+DEFAULT_REFRESH_SECONDS = 30
+
+# Partes do estado publicadas para as sessões (frames e agregados de uma mesma versão)
+PUBLISHED_KEYS = ('source', 'data', 'daily', 'channels', 'rolling', 'years')
+
+
+def _new_state():
+    state = {key: None for key in PUBLISHED_KEYS}
+    state.update(lock=threading.Lock(), published=None)
+    return state
+
+
+def _refresh_state(state, forecast):
+    # Chamado com state['lock'] adquirido. Atualização incremental: se o arquivo só
+    # ganhou linhas no final, apenas o trecho novo é lido e somado aos agregados;
+    # o snapshot Arrow cobre a partida a frio
+    previous = (state['data'], state['source']) if state['data'] is not None else None
+    df, appended, source = refresh_forecast(forecast.path, previous=previous, month=forecast.month)
+
+    if appended is None:
+        # Rollup diário, matriz dia x canal e somas acumuladas calculados uma vez por versão dos dados
+        state['daily'] = build_daily_rollup(df)
+        state['channels'] = build_channel_matrix(df)
+        state['rolling'] = build_cumulative_rollup(state['daily'])
+    elif not appended.empty:
+        state['daily'] = merge_daily_rollup(state['daily'], appended)
+        state['channels'] = state['channels'].merge(appended)
+        state['rolling'] = state['rolling'].merge(state['daily'], appended['ds_normalized'].min())
+    if appended is None or not appended.empty:
+        # Cubo ano x dia x categoria (pequeno: refeito a partir do rollup a cada versão)
+        state['years'] = build_year_cube(state['daily'], forecast.month)
+    state['data'], state['source'] = df, source
+    # Publicação atômica: as sessões leem este dict sem lock e sempre enxergam uma
+    # versão consistente; os objetos publicados nunca são alterados depois
+    state['published'] = {key: state[key] for key in PUBLISHED_KEYS}
+    return state['published']
+
+
+def _refresh_database_state(state, forecast, database):
+    # Backend SQL: as linhas ficam no banco (state['data'] é a tabela, não um frame);
+    # só os agregados por dia, calculados pelo banco, ficam em memória
+    table, source, changed = database.refresh(forecast.path, month=forecast.month)
+    if changed or state['daily'] is None:
+        state['daily'] = table.daily_rollup()
+        state['channels'] = table.channel_matrix()
+        state['rolling'] = build_cumulative_rollup(state['daily'])
+        state['years'] = build_year_cube(state['daily'], forecast.month)
+    state['data'], state['source'] = table, source
+    state['published'] = {key: state[key] for key in PUBLISHED_KEYS}
+    return state['published']
+
+
+class ForecastStore:
+    # Estado por mês compartilhado por todas as sessões do processo, em um LRU
+    # com no máximo max_loaded meses. As sessões recebem os mesmos objetos (sem cópia).
+    # Com database (ForecastDatabase), as linhas ficam no banco SQL local.
+
+    def __init__(self, max_loaded, database=None):
+        self.max_loaded = max_loaded
+        self.database = database
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, forecast):
+        with self._lock:
+            state = self._states.get(forecast)
+            if state is None:
+                state = self._states[forecast] = _new_state()
+            self._states.move_to_end(forecast)
+            while len(self._states) > self.max_loaded:
+                self._states.popitem(last=False)
+            return state
+
+    def loaded(self):
+        with self._lock:
+            return list(self._states)
+
+    def precompute(self, forecast):
+        # Usado pelo worker: atualiza o mês sem contar como uso no LRU. Um mês ainda não
+        # carregado só entra se houver vaga (como o menos recente), sem expulsar os
+        # meses abertos pelas sessões. Devolve None se não havia vaga.
+        with self._lock:
+            state = self._states.get(forecast)
+            if state is None:
+                if len(self._states) >= self.max_loaded:
+                    return None
+                state = self._states[forecast] = _new_state()
+                self._states.move_to_end(forecast, last=False)
+        return self._refresh(state, forecast)
+
+    def _refresh(self, state, forecast):
+        with state['lock']:
+            if self.database is not None:
+                return _refresh_database_state(state, forecast, self.database)
+            return _refresh_state(state, forecast)
+
+    def refresh(self, forecast):
+        # Verifica o arquivo e atualiza o estado (acesso de uma sessão: conta como uso no LRU)
+        state = self._state(forecast)
+        return self._refresh(state, forecast)
+
+    def aggregates(self, forecast):
+        # Leitura avulsa de um mês (ex.: histórico de acurácia): a versão publicada se o
+        # mês está em memória; senão calcula em um estado temporário, fora do LRU
+        with self._lock:
+            state = self._states.get(forecast)
+        published = state['published'] if state is not None else None
+        return published if published is not None else self._refresh(_new_state(), forecast)
+
+    def get(self, forecast):
+        # Com o worker ativo: devolve a última versão publicada sem esperar pela ingestão;
+        # só calcula na hora se o mês ainda não foi publicado
+        published = self._state(forecast)['published']
+        return published if published is not None else self.refresh(forecast)
+
+
+class PrecomputeWorker(threading.Thread):
+    # Thread em segundo plano que varre o diretório de previsões e mantém o store
+    # atualizado: os meses que já estão em memória e, enquanto houver vaga, os mais recentes.
+
+    def __init__(self, store, directory, interval=DEFAULT_REFRESH_SECONDS):
+        super().__init__(name="forecast-precompute", daemon=True)
+        self.store = store
+        self.directory = directory
+        self.interval = interval
+        self.last_run = None
+        self.errors = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval)
+
+    def run_once(self):
+        # Os meses em memória são mantidos atualizados; os mais recentes (o último é o
+        # aberto por padrão) só são pré-calculados enquanto houver vaga no LRU
+        loaded = self.store.loaded()
+        latest = discover_forecasts(self.directory)[::-1][:self.store.max_loaded]
+        forecasts = loaded + [forecast for forecast in latest if forecast not in loaded]
+        for forecast in forecasts:
+            try:
+                self.store.precompute(forecast)
+                self.errors.pop(forecast.path, None)
+            except Exception as e:
+                # A sessão que abrir este mês recalcula e mostra o erro
+                logger.exception("Falha ao pré-calcular %s", forecast.path)
+                self.errors[forecast.path] = str(e)
+        self.last_run = time.time()
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: sem ru_maxrss
+    resource = None
+
+# Modo de perfil: ?profile=1 na URL ou DASHBOARD_PROFILE=1 no ambiente
+PROFILE_ENV = "DASHBOARD_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+# Arquivo JSON lines com uma linha por execução (ou exportação) perfilada
+PROFILE_LOG_ENV = "DASHBOARD_PROFILE_LOG"
+DEFAULT_PROFILE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard_profile.jsonl")
+
+# Histórico em memória por etapa, para p50/p95 no painel de depuração
+HISTORY_SIZE = 500
+
+_history = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+_history_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+# O tracemalloc é do processo inteiro: fica ligado só enquanto houver algum profiler
+# ativo (contagem de referências) e só é desligado se foi ligado por aqui
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def profiling_enabled(query_params=None):
+    if os.environ.get(PROFILE_ENV, "").lower() in _TRUE_VALUES:
+        return True
+    value = (query_params or {}).get(PROFILE_QUERY_PARAM, "")
+    return str(value).lower() in _TRUE_VALUES
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunProfiler:
+    # Mede tempo e memória (tracemalloc) de cada etapa de uma execução do script.
+    # Desativado, stage() não faz nada além do yield.
+    # Pico e variação de memória são globais do processo: só são registrados para as
+    # etapas da thread que criou o profiler (as do pool de gráficos ficam só com o tempo),
+    # e ainda incluem o que outras sessões alocarem ao mesmo tempo.
+
+    def __init__(self, enabled, log_path=None, kind="rerun"):
+        self.enabled = enabled
+        self.log_path = log_path or os.environ.get(PROFILE_LOG_ENV, DEFAULT_PROFILE_LOG)
+        self.kind = kind
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages = []
+        self.total_ms = None
+        self._started = time.perf_counter()
+        self._thread = threading.current_thread()
+        self._release = None
+        if enabled:
+            _acquire_tracing()
+            # Libera o tracemalloc no finish() ou, se a execução parar antes, na coleta do objeto
+            self._release = weakref.finalize(self, _release_tracing)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        trace_memory = threading.current_thread() is self._thread and tracemalloc.is_tracing()
+        if trace_memory:
+            mem_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            record = {'stage': name, 'ms': round(elapsed_ms, 3), 'mem_delta_mb': None, 'mem_peak_mb': None}
+            if trace_memory:
+                mem_after, peak = tracemalloc.get_traced_memory()
+                record['mem_delta_mb'] = round((mem_after - mem_before) / 2**20, 3)
+                record['mem_peak_mb'] = round((peak - mem_before) / 2**20, 3)
+            self.stages.append(record)
+
+    def call(self, name, func, *args, **kwargs):
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def finish(self):
+        if not self.enabled:
+            return None
+        self._release()
+        self.total_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        record = {
+            'ts': time.time(),
+            'run_id': self.run_id,
+            'kind': self.kind,
+            'total_ms': self.total_ms,
+            'max_rss_mb': _max_rss_mb(),
+            'stages': self.stages,
+        }
+        with _history_lock:
+            for stage in self.stages:
+                _history[stage['stage']].append(stage['ms'])
+            _history['total'].append(record['total_ms'])
+        try:
+            with _log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+        return record
+
+    def summary(self):
+        # Tabela da execução atual com p50/p95 do histórico do processo
+        rows = []
+        with _history_lock:
+            for stage in self.stages + [{'stage': 'total', 'ms': self.total_ms}]:
+                history = np.array(_history.get(stage['stage'], ()), dtype=float)
+                rows.append(dict(
+                    stage,
+                    p50_ms=round(float(np.percentile(history, 50)), 3) if len(history) else None,
+                    p95_ms=round(float(np.percentile(history, 95)), 3) if len(history) else None,
+                    runs=len(history),
+                ))
+        return pd.DataFrame(rows)
+
+
+def load_profile_log(log_path=None):
+    # Lê o JSON lines e devolve uma linha por etapa (útil para p50/p95 em produção)
+    log_path = log_path or os.environ.get(PROFILE_LOG_ENV, DEFAULT_PROFILE_LOG)
+    rows = []
+    with open(log_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            for stage in record['stages']:
+                rows.append(dict(stage, run_id=record['run_id'], kind=record['kind'], ts=record['ts']))
+    return pd.DataFrame(rows)
+
+
+def stage_percentiles(log_path=None):
+    stages = load_profile_log(log_path)
+    if stages.empty:
+        return stages
+    return stages.groupby('stage')['ms'].describe(percentiles=[0.5, 0.95])[['count', '50%', '95%', 'max']]
@@ -0,0 +1,160 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregations import build_channel_matrix, build_daily_rollup
+from filters import apply_filters
+from forecast_catalog import ForecastFile
+from forecast_data import CATEGORY_COLUMNS, load_forecast, refresh_forecast
+from forecast_db import ForecastDatabase, default_sql_backend
+from forecast_store import ForecastStore
+
+# Arquivo horário sintético no formato real: latin1, ';', vírgula decimal, colunas
+# com acento, células vazias e dias do mês anterior (descartados pelo filtro de mês)
+SOURCE_CATEGORIES = [
+    "cat_cancelamento", "cat_informação", "cat_reclamação", "cat_troca",
+    "cat_preventiva", "cat_pré-venda", "cat_solicitação",
+]
+SOURCE_CHANNELS = ["magazine_luiza", "shopee", "britânia", "não_informado", "casa_e_vídeo"]
+HEADER = ["ds", "y"] + SOURCE_CATEGORIES + ["semana"] + SOURCE_CHANNELS
+
+RTOL = 1e-5  # valores em float32: a ordem das somas muda o arredondamento
+
+
+def _hourly_lines(start, end, seed):
+    rng = np.random.default_rng(seed)
+    lines = []
+    for ts in pd.date_range(start, end, freq="4h"):
+        categories = np.round(rng.gamma(2.0, 10.0, len(SOURCE_CATEGORIES)), 3)
+        total = round(categories.sum() * rng.uniform(0.9, 1.1), 3)
+        channels = np.round(total * rng.dirichlet(np.ones(len(SOURCE_CHANNELS))), 3)
+        values = [total, *categories, ts.isocalendar().week, *channels]
+        cells = [f"{value}".replace(".", ",") for value in values]
+        cells[2] = "" if rng.random() < 0.1 else cells[2]
+        lines.append(";".join([ts.strftime("%Y-%m-%d %H:%M:%S")] + cells) + "\n")
+    return lines
+
+
+def _write(path, lines, mode="w"):
+    with open(path, mode, encoding="latin1", newline="") as f:
+        if mode == "w":
+            f.write(";".join(HEADER) + "\n")
+        f.writelines(lines)
+
+
+@pytest.fixture
+def forecast_lines():
+    # Fevereiro de 2024 e de 2025 (com os últimos dias de janeiro antes de cada um)
+    return (_hourly_lines("2024-01-30", "2024-02-29 20:00", seed=1)
+            + _hourly_lines("2025-01-30", "2025-02-28 20:00", seed=2))
+
+
+def _forecast(path):
+    return ForecastFile("Fevereiro", str(path), 2, None)
+
+
+def _assert_same_state(incremental, full):
+    pd.testing.assert_frame_equal(incremental['daily'], full['daily'], check_exact=False, rtol=RTOL)
+
+    channels, full_channels = incremental['channels'], full['channels']
+    assert channels.channels == full_channels.channels
+    np.testing.assert_array_equal(channels.days, full_channels.days)
+    np.testing.assert_allclose(channels.values, full_channels.values, rtol=RTOL)
+
+    rolling, full_rolling = incremental['rolling'], full['rolling']
+    assert rolling.columns == full_rolling.columns
+    np.testing.assert_array_equal(rolling.days, full_rolling.days)
+    np.testing.assert_allclose(rolling.cumsum, full_rolling.cumsum, rtol=RTOL)
+
+    assert incremental['source']['sha256'] == full['source']['sha256']
+    assert incremental['source']['reconciliation']['rows'] == full['source']['reconciliation']['rows']
+
+
+def test_append_is_detected(tmp_path, forecast_lines):
+    path = tmp_path / "forecast_Fevereiro.csv"
+    split = len(forecast_lines) - 20
+    _write(path, forecast_lines[:split])
+    df, tail, source = refresh_forecast(str(path), month=2)
+    assert tail is None
+
+    _write(path, forecast_lines[split:], mode="a")
+    df, tail, source = refresh_forecast(str(path), previous=(df, source), month=2)
+    assert len(tail) == 20
+    assert len(df) == len(load_forecast(str(path), snapshot_dir=str(tmp_path / "full"), month=2))
+
+
+def test_rewrite_is_a_full_reload(tmp_path, forecast_lines):
+    path = tmp_path / "forecast_Fevereiro.csv"
+    _write(path, forecast_lines)
+    df, _, source = refresh_forecast(str(path), month=2)
+
+    _write(path, forecast_lines[:-1] + _hourly_lines("2025-02-28 20:00", "2025-02-28 20:00", seed=9))
+    _, tail, _ = refresh_forecast(str(path), previous=(df, source), month=2)
+    assert tail is None
+
+
+@pytest.mark.parametrize("split_day", ["2024-02-15 12:00", "2025-02-01 00:00", "2025-02-28 08:00"])
+def test_incremental_store_matches_full_reload(tmp_path, forecast_lines, split_day):
+    # O corte cai no meio de um dia: o último dia do trecho antigo é re-somado com as linhas novas
+    split = next(i for i, line in enumerate(forecast_lines) if line.startswith(split_day))
+    path = tmp_path / "forecast_Fevereiro.csv"
+    _write(path, forecast_lines[:split])
+    store = ForecastStore(1)
+    store.refresh(_forecast(path))
+    _write(path, forecast_lines[split:], mode="a")
+    incremental = store.refresh(_forecast(path))
+
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    full_path = full_dir / path.name
+    shutil.copy(path, full_path)
+    full = ForecastStore(1).refresh(_forecast(full_path))
+
+    _assert_same_state(incremental, full)
+
+
+def _sql_backends():
+    backends = ['sqlite']
+    if default_sql_backend() == 'duckdb':
+        backends.append('duckdb')
+    return backends
+
+
+@pytest.mark.parametrize("backend", _sql_backends())
+def test_sql_backend_matches_pandas(tmp_path, forecast_lines, backend):
+    path = tmp_path / "forecast_Fevereiro.csv"
+    _write(path, forecast_lines)
+    df = load_forecast(str(path), snapshot_dir=str(tmp_path / "snapshots"), month=2)
+
+    database = ForecastDatabase(os.path.join(tmp_path, "forecast.db"), backend)
+    try:
+        table, source, changed = database.refresh(str(path), month=2, chunksize=50)
+        assert changed
+
+        pd.testing.assert_frame_equal(table.daily_rollup(), build_daily_rollup(df), check_exact=False, rtol=RTOL)
+        channels, expected = table.channel_matrix(), build_channel_matrix(df)
+        assert channels.channels == expected.channels
+        np.testing.assert_array_equal(channels.days, expected.days)
+        np.testing.assert_allclose(channels.values, expected.values, rtol=RTOL)
+
+        for selected_dates, selected_years in [
+            ((), [2024, 2025]),
+            ((pd.Timestamp("2024-02-10").date(), pd.Timestamp("2025-02-05").date()), [2024, 2025]),
+            ((pd.Timestamp("2024-02-10").date(), pd.Timestamp("2025-02-05").date()), [2025]),
+            ((), [2023]),
+        ]:
+            expected_rows = apply_filters(df, selected_dates, selected_years)
+            assert table.count(selected_dates, selected_years) == len(expected_rows)
+            rows = table.rows(selected_dates, selected_years)
+            assert sorted(rows.columns) == sorted(expected_rows.columns)
+            np.testing.assert_array_equal(rows['ds'].to_numpy(), expected_rows['ds'].to_numpy())
+            np.testing.assert_allclose(rows[CATEGORY_COLUMNS + ['total']].to_numpy(),
+                                       expected_rows[CATEGORY_COLUMNS + ['total']].to_numpy(), rtol=RTOL)
+
+        # Arquivo sem mudanças: nada é reingerido
+        assert not database.refresh(str(path), month=2)[2]
+    finally:
+        database.close()